@@ -0,0 +1,138 @@
+"""
+Memory admission control for page renders.
+
+Before rasterizing, a render reserves the memory it is about to use from the
+shared RenderScheduler: its pixmap (page size x DPI x channels, or one strip
+of it for renders done in strips) plus the output buffer it fills, such as a
+CF_DIB payload. A render waits while those already running would take the
+total over the budget. One that could never fit is given smaller strips
+instead of failing, or, if it cannot be split, runs once nothing else does.
+
+Worker processes share one scheduler through a manager process (see
+shared_scheduler()), so the budget holds across a process pool as well.
+Peak reserved memory and time spent queueing are kept in stats().
+"""
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+from instrumentation import span
+
+DEFAULT_BUDGET_BYTES = 1024 * 1024 * 1024
+# Strips are not made smaller than this to squeeze a render into the budget
+MIN_STRIP_BYTES = 1024 * 1024
+
+class RenderScheduler:
+    """Admits renders while their reserved memory stays within max_bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self._cond = threading.Condition()
+        self._reserved = 0
+        self._running = 0
+        self._queued = 0
+        self._stats = {"renders": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                       "max_queued": 0, "peak_bytes": 0, "smaller_strips": 0, "over_budget": 0}
+
+    def acquire(self, raster, output=0, strip=None):
+        """
+        Reserve memory for one render, waiting until it fits, and return
+        (strip, reserved). raster is the pixmap size of a one-shot render and
+        output the size of the buffer it fills; strip is the strip size of a
+        render that can be split (None if it cannot), reduced when needed.
+        Pass reserved to release() when the render is done.
+        """
+        piece = raster if strip is None else min(raster, strip)
+        smaller = strip is not None and piece + output > self.max_bytes
+        if smaller:
+            # Oversized: render in strips small enough to fit next to the output
+            piece = strip = max(MIN_STRIP_BYTES, self.max_bytes - output)
+        need = piece + output
+        start = time.perf_counter()
+        with self._cond:
+            if self._running and self._reserved + need > self.max_bytes:
+                self._queued += 1
+                self._stats["waits"] += 1
+                self._stats["max_queued"] = max(self._stats["max_queued"], self._queued)
+                # A render larger than the whole budget only has to wait until it runs alone
+                while self._running and self._reserved + need > self.max_bytes:
+                    self._cond.wait()
+                self._queued -= 1
+                waited = time.perf_counter() - start
+                self._stats["wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._stats["smaller_strips"] += smaller
+            if need > self.max_bytes:
+                self._stats["over_budget"] += 1
+            self._running += 1
+            self._reserved += need
+            self._stats["renders"] += 1
+            self._stats["peak_bytes"] = max(self._stats["peak_bytes"], self._reserved)
+        return strip, need
+
+    def release(self, reserved):
+        with self._cond:
+            self._running -= 1
+            self._reserved -= reserved
+            self._cond.notify_all()
+
+    def merge(self, stats):
+        """Fold in the stats of another scheduler, e.g. the one a process pool shared."""
+        with self._cond:
+            for name, value in stats.items():
+                if name not in self._stats:
+                    continue
+                if name.startswith("max_") or name == "peak_bytes":
+                    self._stats[name] = max(self._stats[name], value)
+                else:
+                    self._stats[name] += value
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, max_bytes=self.max_bytes, reserved_bytes=self._reserved)
+
+    def summary(self):
+        stats = self.stats()
+        mb = 1024 * 1024
+        return (f"Render memory: peak {stats['peak_bytes'] / mb:.1f} MB of {stats['max_bytes'] / mb:.0f} MB budget, "
+                f"{stats['waits']} of {stats['renders']} render(s) queued for {stats['wait_seconds']:.2f} s, "
+                f"{stats['smaller_strips']} split into smaller strips")
+
+_scheduler = None
+
+def get_scheduler():
+    """Scheduler shared by every render in this process."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RenderScheduler()
+    return _scheduler
+
+def set_scheduler(scheduler):
+    """Use scheduler (e.g. a proxy from shared_scheduler()) for this process's renders."""
+    global _scheduler
+    _scheduler = scheduler
+
+@contextmanager
+def admit(raster, output=0, strip=None):
+    """Hold a reservation for one render for the duration of a with block; yields the strip size to use."""
+    scheduler = get_scheduler()
+    with span("render.admit", bytes=raster + output):
+        strip, reserved = scheduler.acquire(raster, output, strip)
+    try:
+        yield strip
+    finally:
+        scheduler.release(reserved)
+
+class _SchedulerManager(BaseManager):
+    pass
+
+_SchedulerManager.register("RenderScheduler", RenderScheduler)
+
+@contextmanager
+def shared_scheduler(max_bytes):
+    """
+    Host a RenderScheduler in a manager process for the duration of a with
+    block, yielding a proxy that worker processes pass to set_scheduler().
+    """
+    with _SchedulerManager() as manager:
+        yield manager.RenderScheduler(max_bytes)
@@ -0,0 +1,277 @@
+"""
+Batch capture of many (workbook, sheet, range) jobs described in a job spec.
+
+The spec is JSON, or YAML when PyYAML is installed:
+
+    {
+      "defaults": {"orientation": "landscape", "paper": "A4", "dpi": 300},
+      "jobs": [
+        {"file": "Itut 7A Well Completions Schematic.xls", "sheet": "Completion String",
+         "range": "B2:AD88", "pages": "1-3", "crop": "auto",
+         "output": "completion/p{page:02d}.png"}
+      ]
+    }
+
+A job lists file, sheet and range, plus optionally orientation, paper,
+pages_wide, pages ("all" or e.g. "1-3,5"), dpi (a number, or a per-page output
+target such as "8mp", "4000px" or "10mb"), crop ("auto", a top fraction
+such as 0.75, or "x0,y0,x1,y1" in points) and output, a file name pattern with
+{workbook}, {sheet}, {range} and {page} fields whose extension picks the image
+format. Relative paths in the spec are resolved against the spec's directory
+(files) and --out (outputs).
+
+Jobs on the same workbook run one after another on one worker, so the file is
+opened once; different workbooks are captured in parallel, each worker driving
+its own Excel instance. Failures that look transient (COM and file-system
+errors) are retried. A manifest with every job's outputs, attempts and stage
+timings, plus peak render memory and queue waits, is written to --out.
+
+Usage:
+    python batch.py jobs.json [--out DIR] [--workers N] [--retries N] [--memory-budget MB] [--manifest PATH]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from admission import get_scheduler
+from excel_session import get_pool, init_com_thread
+from jobs import JobExecutor
+import instrumentation
+from excel_layout import split_range_into_pages
+from pagination import PAPER_SIZES
+from excel_export import get_pages_pdf
+from render_engine import MUPDF_LOCK, parse_crop, parse_dpi, parse_page_spec, save_page
+
+JOB_DEFAULTS = {
+    "orientation": "landscape",
+    "paper": "A4",
+    "pages_wide": 1,
+    "pages": "all",
+    "dpi": 300,
+    "crop": None,
+    "output": "{workbook}_{sheet}_{range}_p{page:03d}.png",
+}
+REQUIRED_FIELDS = ("file", "sheet", "range")
+JOB_FIELDS = set(REQUIRED_FIELDS) | set(JOB_DEFAULTS) | {"name"}
+
+# Seconds to wait before retry n is n times this
+RETRY_DELAY = 2.0
+
+def load_spec(path):
+    """Read a job spec and return its jobs with defaults applied and paths resolved."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML job specs need PyYAML (pip install pyyaml); use JSON otherwise.")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if isinstance(data, list):
+        data = {"jobs": data}
+    if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+        raise ValueError(f"{path}: expected a list of jobs or an object with a 'jobs' list.")
+
+    defaults = dict(JOB_DEFAULTS, **data.get("defaults", {}))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, entry in enumerate(data["jobs"], 1):
+        job = dict(defaults, **entry)
+        unknown = set(job) - JOB_FIELDS
+        if unknown:
+            raise ValueError(f"Job {number}: unknown field(s) {', '.join(sorted(unknown))}.")
+        missing = [field for field in REQUIRED_FIELDS if not job.get(field)]
+        if missing:
+            raise ValueError(f"Job {number}: missing {', '.join(missing)}.")
+        job["file"] = os.path.join(base_dir, job["file"])
+        job["orientation"] = job["orientation"].lower()
+        if job["paper"] not in PAPER_SIZES:
+            raise ValueError(f"Job {number}: unknown paper size '{job['paper']}'.")
+        if isinstance(job["crop"], list):
+            job["crop"] = tuple(float(v) for v in job["crop"])
+        elif job["crop"] is not None:
+            job["crop"] = parse_crop(str(job["crop"]))
+        try:
+            job["dpi"] = parse_dpi(job["dpi"])
+        except ValueError as e:
+            raise ValueError(f"Job {number}: {e}")
+        job.setdefault("name", f"{os.path.basename(job['file'])} {job['sheet']}!{job['range']}")
+        job["index"] = number
+        jobs.append(job)
+    return jobs
+
+def group_by_workbook(jobs):
+    """Jobs grouped by workbook, in order of first appearance."""
+    groups = OrderedDict()
+    for job in jobs:
+        groups.setdefault(os.path.normcase(os.path.abspath(job["file"])), []).append(job)
+    return list(groups.values())
+
+def _safe(text):
+    return re.sub(r'[\\/:*?"<>|]+', "-", str(text)).strip()
+
+def output_file(job, page_num, out_dir):
+    """Image path for one page of a job, from its output pattern."""
+    name = job["output"].format(workbook=_safe(os.path.splitext(os.path.basename(job["file"]))[0]),
+                                sheet=_safe(job["sheet"]), range=_safe(job["range"]), page=page_num)
+    return os.path.join(out_dir, name)
+
+def run_job(job, out_dir, timings):
+    """Paginate, export and render one job, recording stage times in timings; returns the image paths."""
+    import fitz  # PyMuPDF
+    start = time.perf_counter()
+    page_ranges = split_range_into_pages(job["file"], job["sheet"], job["range"], job["orientation"],
+                                         job["paper"], int(job["pages_wide"]))
+    page_numbers = parse_page_spec(str(job["pages"]), len(page_ranges))
+    timings["paginate"] = time.perf_counter() - start
+
+    # Only the selected pages are exported; page i of the PDF is page_numbers[i]
+    start = time.perf_counter()
+    pages_pdf = get_pages_pdf(job["file"], job["sheet"], [page_ranges[n - 1] for n in page_numbers],
+                              job["orientation"], job["paper"])
+    timings["export"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = []
+    with MUPDF_LOCK:
+        doc = fitz.open(pages_pdf)
+    try:
+        for i, page_num in enumerate(page_numbers):
+            path = output_file(job, page_num, out_dir)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            fmt = os.path.splitext(path)[1].lstrip(".").lower() or "png"
+            with MUPDF_LOCK:
+                save_page(doc.load_page(i), job["dpi"], path, fmt, job["crop"])
+            outputs.append(path)
+    finally:
+        with MUPDF_LOCK:
+            doc.close()
+    timings["render"] = time.perf_counter() - start
+    return outputs
+
+def _transient_errors():
+    errors = (OSError,)
+    try:
+        from pywintypes import com_error
+    except ImportError:
+        return errors
+    return errors + (com_error,)
+
+def is_transient(e):
+    """Whether a failure is worth retrying: COM hiccups and locked files, not bad input."""
+    if isinstance(e, (FileNotFoundError, IsADirectoryError, NotADirectoryError)):
+        return False
+    return isinstance(e, _transient_errors())
+
+def run_with_retries(job, out_dir, retries):
+    """Run one job, retrying transient failures; returns its manifest entry."""
+    entry = {"index": job["index"], "name": job["name"], "file": job["file"], "sheet": job["sheet"],
+             "range": job["range"], "status": "failed", "attempts": 0, "outputs": [], "error": None}
+    timings = {}
+    start = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        entry["attempts"] = attempt
+        try:
+            entry["outputs"] = run_job(job, out_dir, timings)
+            entry["status"] = "ok"
+            entry["error"] = None
+            break
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            if attempt > retries or not is_transient(e):
+                break
+            print(f"  {job['name']}: {entry['error']} (retrying)")
+            time.sleep(RETRY_DELAY * attempt)
+    timings["total"] = time.perf_counter() - start
+    entry["timings"] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    return entry
+
+def run_group(jobs, out_dir, retries):
+    """Run every job on one workbook, in spec order, on the calling worker."""
+    entries = []
+    for job in jobs:
+        entry = run_with_retries(job, out_dir, retries)
+        if entry["status"] == "ok":
+            print(f"  {job['name']}: {len(entry['outputs'])} page(s) in {entry['timings']['total']:.1f} s")
+        else:
+            print(f"  {job['name']}: FAILED after {entry['attempts']} attempt(s): {entry['error']}")
+        entries.append(entry)
+    return entries
+
+def run_batch(jobs, out_dir, workers=2, retries=2):
+    """Run jobs grouped by workbook across worker threads; returns manifest entries in spec order."""
+    groups = group_by_workbook(jobs)
+    workers = max(1, min(workers, len(groups)))
+    # One Excel instance per worker thread (COM objects stay on the thread that made them)
+    get_pool().max_apps = workers
+    # Each worker quits its own instances before stopping, so the exports can be removed at exit
+    executor = JobExecutor(workers=workers, initializer=init_com_thread, name="batch",
+                           finalizer=get_pool().close_thread)
+    entries = []
+
+    def on_error(job, e):
+        # run_group only raises on bugs outside a job; record every job of the group as failed
+        for spec in job.args[0]:
+            entries.append({"index": spec["index"], "name": spec["name"], "file": spec["file"],
+                            "sheet": spec["sheet"], "range": spec["range"], "status": "failed",
+                            "attempts": 0, "outputs": [], "error": f"{type(e).__name__}: {e}", "timings": {}})
+
+    for group in groups:
+        executor.submit(run_group, group, out_dir, retries, name=group[0]["file"],
+                        on_done=lambda job, result: entries.extend(result), on_error=on_error)
+    executor.shutdown()
+    executor.poll()
+    return sorted(entries, key=lambda entry: entry["index"])
+
+def main(argv=None):
+    argv = instrumentation.configure_from_argv(argv)
+    parser = argparse.ArgumentParser(description="Capture many Excel ranges to image files from a job spec.")
+    parser.add_argument("spec", help="Job spec (.json, or .yaml with PyYAML installed)")
+    parser.add_argument("--out", default=".", help="Directory for images and the manifest (default: current directory)")
+    parser.add_argument("--workers", type=int, default=2, help="Workbooks captured in parallel (default: 2)")
+    parser.add_argument("--retries", type=int, default=2, help="Retries for transient failures (default: 2)")
+    parser.add_argument("--memory-budget", type=int, default=None, metavar="MB",
+                        help="Memory that concurrent renders may reserve in total (default: %d)"
+                             % (get_scheduler().max_bytes // (1024 * 1024)))
+    parser.add_argument("--manifest", default=None, help="Manifest path (default: OUT/manifest.json)")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_spec(args.spec)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.memory_budget:
+        get_scheduler().max_bytes = args.memory_budget * 1024 * 1024
+
+    os.makedirs(args.out, exist_ok=True)
+    print(f"Running {len(jobs)} job(s) on {len(group_by_workbook(jobs))} workbook(s)")
+    started = time.time()
+    start = time.perf_counter()
+    entries = run_batch(jobs, args.out, args.workers, args.retries)
+    failed = sum(entry["status"] != "ok" for entry in entries)
+    manifest = {
+        "spec": os.path.abspath(args.spec),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "seconds": round(time.perf_counter() - start, 3),
+        "workers": args.workers,
+        "succeeded": len(entries) - failed,
+        "failed": failed,
+        "render_memory": get_scheduler().stats(),
+        "jobs": entries,
+    }
+    manifest_path = args.manifest or os.path.join(args.out, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"{len(entries) - failed} of {len(entries)} job(s) succeeded in {manifest['seconds']:.1f} s; "
+          f"manifest written to {os.path.abspath(manifest_path)}")
+    print(get_scheduler().summary())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
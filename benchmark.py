@@ -0,0 +1,325 @@
+"""
+Benchmarks for the render and pagination hot paths.
+
+Synthetic inputs are generated from fixed seeds, so runs on different commits
+are comparable:
+
+- PDFs that are text-heavy, vector-heavy or image-heavy, from A4 to A0,
+  rendered through the clipboard payload path (render -> CF_DIB) at each
+  quality level. Each case runs in a fresh process, so peak memory is the
+  case's own.
+- Row/column geometry from 100 to 1,000,000 rows, paginated with
+  PaginationIndex the way split_range_into_pages() does.
+- Start-up imports: the modules each GUI imports before its window appears
+  are timed with `python -X importtime`. The run fails (exit status 1) if
+  they exceed --import-budget-ms or pull in a heavy module such as PyMuPDF.
+
+Usage:
+    python benchmark.py [--quick] [--repeat N] [--json results.json] [--compare baseline.json]
+    python benchmark.py --only startup   # import-time budget check only
+"""
+import argparse
+import ast
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+QUALITY_TO_DPI = {"Low Quality": 100, "Medium Quality": 300, "High Quality": 600}
+
+# Portrait paper sizes in points
+PAPER_POINTS = {
+    "A4": (595, 842),
+    "A3": (842, 1191),
+    "A2": (1191, 1684),
+    "A1": (1684, 2384),
+    "A0": (2384, 3370),
+}
+
+PDF_KINDS = ("text", "vector", "image")
+PAGES_PER_PDF = 2
+ROW_COUNTS = (100, 1000, 10000, 100000, 1000000)
+
+GUI_SCRIPTS = ("main.py", "excel_capture.py", "final_excel_capture.py")
+# Modules that must not load before a window paints; they are imported on first use or by startup.warm_up()
+HEAVY_IMPORTS = ("fitz", "pymupdf", "numpy", "xlwings", "win32clipboard", "pythoncom", "PIL")
+DEFAULT_IMPORT_BUDGET_MS = 250
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+
+def make_pdf(path, kind, paper, pages=PAGES_PER_PDF, seed=0):
+    """Write a deterministic synthetic PDF whose content density scales with the page area."""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(f"{kind}-{paper}-{seed}")
+    width, height = PAPER_POINTS[paper]
+    area_scale = (width * height) / (595 * 842)
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=width, height=height)
+        if kind == "text":
+            lines = int(70 * area_scale ** 0.5)
+            for i in range(lines):
+                y = 30 + i * (height - 60) / lines
+                words = " ".join(f"cell{rng.randrange(10000)}" for _ in range(int(12 * area_scale ** 0.5)))
+                page.insert_text((30, y), f"{page_num}.{i} {words}", fontsize=rng.choice((6, 8, 9, 10)))
+        elif kind == "vector":
+            shape = page.new_shape()
+            for _ in range(int(1500 * area_scale)):
+                x0, y0 = rng.uniform(0, width), rng.uniform(0, height)
+                x1, y1 = x0 + rng.uniform(-80, 80), y0 + rng.uniform(-80, 80)
+                choice = rng.random()
+                if choice < 0.6:
+                    shape.draw_line((x0, y0), (x1, y1))
+                elif choice < 0.85:
+                    shape.draw_rect(fitz.Rect(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)))
+                else:
+                    shape.draw_bezier((x0, y0), (x1, y0), (x0, y1), (x1, y1))
+                shape.finish(color=(rng.random(), rng.random(), rng.random()), width=rng.uniform(0.2, 2.0))
+            shape.commit()
+        else:
+            tiles = max(1, int(6 * area_scale))
+            for _ in range(tiles):
+                w, h = rng.randrange(200, 600), rng.randrange(150, 450)
+                pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, w, h), False)
+                pix.set_rect(pix.irect, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+                # Noisy bands so the image does not compress to nothing
+                for _ in range(20):
+                    y = rng.randrange(h)
+                    pix.set_rect(fitz.IRect(0, y, w, min(h, y + rng.randrange(1, 12))),
+                                 (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+                x, y = rng.uniform(0, width - 150), rng.uniform(0, height - 100)
+                page.insert_image(fitz.Rect(x, y, min(width, x + w / 2), min(height, y + h / 2)), pixmap=pix)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+def make_geometry(rows, cols=30, seed=0):
+    """Deterministic column widths and row heights in cm, like a long engineering schedule."""
+    rng = random.Random(f"geometry-{rows}-{cols}-{seed}")
+    col_widths = [rng.uniform(8, 20) * 0.142 for _ in range(cols)]
+    row_heights = [rng.choice((12.75, 15.0, 15.0, 15.0, 25.5, 30.0)) * 0.03528 for _ in range(rows)]
+    return col_widths, row_heights
+
+# ---------------------------------------------------------------------------
+# Cases (each runs in its own process)
+
+def _render_case(pdf_path, dpi, repeat):
+    import fitz  # PyMuPDF
+    from instrumentation import peak_rss
+    from render_engine import page_dib
+
+    doc = fitz.open(pdf_path)
+    baseline = peak_rss()
+    times = []
+    pixels = payload = 0
+    for _ in range(repeat):
+        pixels = payload = 0
+        start = time.perf_counter()
+        for page in doc:
+            data = page_dib(page, dpi)
+            payload += len(data)
+            pixels += int.from_bytes(data[4:8], "little") * int.from_bytes(data[8:12], "little", signed=True)
+            del data
+        times.append(time.perf_counter() - start)
+    pages = doc.page_count
+    doc.close()
+    return {"seconds": times, "pages": pages, "pixels": pixels, "payload_bytes": payload,
+            "peak_rss_delta_mb": (peak_rss() - baseline) / (1024 * 1024)}
+
+def _pagination_case(rows, repeat):
+    from instrumentation import peak_rss
+    from pagination import PaginationIndex, page_addresses
+
+    col_widths, row_heights = make_geometry(rows)
+    baseline = peak_rss()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index = PaginationIndex(col_widths, row_heights)
+        _, pages = index.paginate("A4", "landscape", pages_wide=1)
+        addresses = page_addresses((2, 2), pages)
+        times.append(time.perf_counter() - start)
+    return {"seconds": times, "rows": rows, "page_count": len(addresses),
+            "peak_rss_delta_mb": (peak_rss() - baseline) / (1024 * 1024)}
+
+def _run_isolated(fn, *args):
+    """Run one case in a fresh worker process so its peak memory is its own."""
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(fn, args)
+
+# ---------------------------------------------------------------------------
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_render_benchmarks(papers, qualities, repeat, max_mpix, work_dir):
+    results = []
+    for kind in PDF_KINDS:
+        for paper in papers:
+            pdf_path = make_pdf(os.path.join(work_dir, f"{kind}-{paper}.pdf"), kind, paper)
+            for quality in qualities:
+                dpi = QUALITY_TO_DPI[quality]
+                width, height = PAPER_POINTS[paper]
+                mpix = width * height * (dpi / 72) ** 2 / 1e6
+                case = {"benchmark": "render", "name": f"{kind} {paper} @{dpi}dpi",
+                        "kind": kind, "paper": paper, "dpi": dpi}
+                if mpix > max_mpix:
+                    case["skipped"] = f"{mpix:.0f} MPix per page exceeds --max-mpix {max_mpix:g}"
+                    results.append(case)
+                    print(f"  {case['name']:<24} skipped ({case['skipped']})")
+                    continue
+                case.update(_run_isolated(_render_case, pdf_path, dpi, repeat))
+                best = min(case["seconds"])
+                case["median_seconds"] = statistics.median(case["seconds"])
+                case["pages_per_s"] = case["pages"] / best
+                case["mpix_per_s"] = case["pixels"] / best / 1e6
+                results.append(case)
+                print(f"  {case['name']:<24} {case['pages_per_s']:8.2f} pages/s {case['mpix_per_s']:8.1f} MPix/s "
+                      f"{case['peak_rss_delta_mb']:8.1f} MB peak")
+    return results
+
+def run_pagination_benchmarks(row_counts, repeat):
+    results = []
+    for rows in row_counts:
+        case = {"benchmark": "pagination", "name": f"paginate {rows} rows", "rows": rows}
+        case.update(_run_isolated(_pagination_case, rows, repeat))
+        best = min(case["seconds"])
+        case["median_seconds"] = statistics.median(case["seconds"])
+        case["rows_per_s"] = rows / best
+        results.append(case)
+        print(f"  {case['name']:<24} {best * 1000:10.2f} ms {case['rows_per_s'] / 1e6:8.2f} Mrows/s "
+              f"{case['page_count']:6d} pages {case['peak_rss_delta_mb']:8.1f} MB peak")
+    return results
+
+def gui_imports(script):
+    """Top-level modules a GUI script imports before it builds its window."""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), script)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us, depth) tuples."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # Header line
+        stripped = name.lstrip()
+        entries.append((stripped, int(self_us), int(cumulative_us), (len(name) - len(stripped) - 1) // 2))
+    return entries
+
+def measure_imports(modules, cwd):
+    """Import modules in a fresh interpreter; return (total ms, names of every module loaded)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+                          capture_output=True, text=True, cwd=cwd)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{proc.stderr[-2000:]}")
+    entries = parse_importtime(proc.stderr)
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return total_us / 1000, [name for name, _, _, _ in entries]
+
+def run_startup_checks(repeat, budget_ms):
+    """Time each GUI's pre-window imports and check them against the budget."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for script in GUI_SCRIPTS:
+        modules = gui_imports(os.path.join(here, script))
+        runs = [measure_imports(modules, here) for _ in range(repeat)]
+        best_ms = min(total for total, _ in runs)
+        loaded = runs[0][1]
+        heavy = sorted({name for name in loaded if name.split(".")[0] in HEAVY_IMPORTS})
+        case = {"benchmark": "startup", "name": f"imports {script}", "seconds": [total / 1000 for total, _ in runs],
+                "modules_loaded": len(loaded), "heavy_modules": heavy, "budget_ms": budget_ms,
+                "passed": best_ms <= budget_ms and not heavy}
+        results.append(case)
+        verdict = "ok" if case["passed"] else "FAIL"
+        print(f"  {case['name']:<32} {best_ms:8.1f} ms {len(loaded):5d} modules  {verdict}"
+              + (f" (heavy: {', '.join(heavy)})" if heavy else ""))
+    return results
+
+def compare(results, baseline_path):
+    """Print best-time ratios against an earlier --json result file (>1 means faster now)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {case["name"]: case for case in json.load(f)["results"] if "seconds" in case}
+    print(f"\nCompared with {baseline_path}:")
+    for case in results:
+        old = baseline.get(case["name"])
+        if old is None or "seconds" not in case:
+            continue
+        ratio = min(old["seconds"]) / min(case["seconds"])
+        print(f"  {case['name']:<24} {ratio:6.2f}x {'faster' if ratio >= 1 else 'slower'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the render and pagination hot paths.")
+    parser.add_argument("--quick", action="store_true", help="A4/A3, low and medium quality, up to 100k rows")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per case; the best is reported")
+    parser.add_argument("--only", choices=["render", "pagination", "startup"], help="Run one group of benchmarks")
+    parser.add_argument("--max-mpix", type=float, default=150,
+                        help="Skip render cases whose page exceeds this many megapixels (default: 150)")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_IMPORT_BUDGET_MS,
+                        help=f"Start-up import budget per GUI (default: {DEFAULT_IMPORT_BUDGET_MS} ms)")
+    parser.add_argument("--json", metavar="PATH", help="Write results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="Compare with an earlier --json result file")
+    args = parser.parse_args(argv)
+
+    papers = ["A4", "A3"] if args.quick else list(PAPER_POINTS)
+    qualities = ["Low Quality", "Medium Quality"] if args.quick else list(QUALITY_TO_DPI)
+    row_counts = [n for n in ROW_COUNTS if n <= 100000] if args.quick else list(ROW_COUNTS)
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="pdf_to_clipboard_bench_")
+    try:
+        if args.only in (None, "render"):
+            print("Render -> CF_DIB payload:")
+            results += run_render_benchmarks(papers, qualities, args.repeat, args.max_mpix, work_dir)
+        if args.only in (None, "pagination"):
+            print("Pagination:")
+            results += run_pagination_benchmarks(row_counts, args.repeat)
+        if args.only in (None, "startup"):
+            print("Start-up imports:")
+            results += run_startup_checks(args.repeat, args.import_budget_ms)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    import fitz  # PyMuPDF
+    report = {
+        "revision": _git_revision(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {os.path.abspath(args.json)}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0 if all(case.get("passed", True) for case in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from instrumentation import span
+
+# BITMAPINFOHEADER: size, width, height, planes, bit count, compression,
+# image size, x/y pixels per metre, colours used, colours important
+BITMAPINFOHEADER = struct.Struct("<IiiHHIIiiII")
+BI_RGB = 0
+
+# DROPFILES: offset of the file list, drop point x/y, non-client flag, wide-char flag
+DROPFILES = struct.Struct("<IiiII")
+
+# zlib level for the PNG published next to CF_DIB; level 1 already shrinks
+# rendered pages 10-50x and is several times faster than the default 6
+PNG_COMPRESSION = 1
+
+# Registered clipboard formats for vector captures
+SVG_FORMAT = "image/svg+xml"
+PDF_FORMAT = "Portable Document Format"
+FORMAT_LABELS = {"CF_DIB": "DIB", SVG_FORMAT: "SVG", PDF_FORMAT: "PDF"}
+
+# Formats published next to CF_DIB (the GUIs toggle the file drop)
+publish_png = True
+publish_file_drop = False
+
+# Dropped files older than this are deleted when the next one is written
+DROP_FILE_MAX_AGE = 24 * 60 * 60
+
+def dib_stride(width, bits_per_pixel):
+    """Bytes per DIB row; rows are padded to a 4-byte boundary."""
+    return ((width * bits_per_pixel + 31) // 32) * 4
+
+def dib_header(width, height, bits_per_pixel, dpi=96, colors_used=0):
+    """Pack a BITMAPINFOHEADER for a bottom-up, uncompressed DIB."""
+    image_size = dib_stride(width, bits_per_pixel) * height
+    pixels_per_metre = int(dpi / 0.0254 + 0.5)
+    return BITMAPINFOHEADER.pack(BITMAPINFOHEADER.size, width, height, 1, bits_per_pixel, BI_RGB,
+                                 image_size, pixels_per_metre, pixels_per_metre, colors_used, 0)
+
+# Gray level at or above which a pixel becomes white in a 1-bit DIB; kept
+# above mid-gray so thin anti-aliased lines survive as black
+BILEVEL_THRESHOLD = 160
+
+def dib_palette(bits_per_pixel):
+    """RGBQUAD gray ramp for a palette DIB: 256 levels at 8 bpp, black and white at 1 bpp."""
+    levels = 1 << bits_per_pixel
+    return b"".join(bytes((v, v, v, 0)) for v in (i * 255 // (levels - 1) for i in range(levels)))
+
+class DibWriter:
+    """
+    Assembles a CF_DIB payload (BITMAPINFOHEADER, palette if any, then
+    bottom-up rows) from pixmaps written top to bottom, e.g. the strips of a
+    tiled render. At 24 bits per pixel it takes RGB pixmaps and stores BGR;
+    at 8 (gray palette) or 1 (black and white) it takes grayscale pixmaps.
+    """
+
+    def __init__(self, width, height, dpi=96, bits_per_pixel=24):
+        if bits_per_pixel not in (24, 8, 1):
+            raise ValueError(f"Unsupported DIB depth {bits_per_pixel}.")
+        self.width = width
+        self.height = height
+        self.bits = bits_per_pixel
+        self.stride = dib_stride(width, bits_per_pixel)
+        palette = dib_palette(bits_per_pixel) if bits_per_pixel < 24 else b""
+        header = dib_header(width, height, bits_per_pixel, dpi, len(palette) // 4) + palette
+        self.offset = len(header)
+        self.out = bytearray(self.offset + self.stride * height)
+        self.out[:self.offset] = header
+        self.row = 0
+
+    def write(self, pix):
+        if pix.n != (3 if self.bits == 24 else 1) or pix.alpha:
+            raise ValueError(f"Expected {'an RGB' if self.bits == 24 else 'a grayscale'} pixmap without alpha.")
+        if pix.width != self.width or self.row + pix.height > self.height:
+            raise ValueError("Pixmap does not fit the remaining rows of the bitmap.")
+        if self.bits == 1:
+            self._write_bilevel(pix)
+            return
+        row_bytes = self.width * pix.n
+        samples = pix.samples_mv
+        out = self.out
+        for y in range(pix.height):
+            src = y * pix.stride
+            dst = self.offset + (self.height - 1 - self.row - y) * self.stride
+            out[dst:dst + row_bytes] = samples[src:src + row_bytes]
+            if self.bits == 24:
+                # Swap R and B; G already landed in place via the full copy
+                out[dst:dst + row_bytes:3] = samples[src + 2:src + row_bytes:3]
+                out[dst + 2:dst + row_bytes:3] = samples[src:src + row_bytes:3]
+        self.row += pix.height
+
+    def _write_bilevel(self, pix):
+        import numpy as np
+        gray = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :self.width]
+        packed = np.packbits(gray >= BILEVEL_THRESHOLD, axis=1)  # MSB first, as DIB rows are
+        rows = np.frombuffer(self.out, dtype=np.uint8, offset=self.offset).reshape(self.height, self.stride)
+        top = self.height - self.row
+        rows[top - pix.height:top, :packed.shape[1]] = packed[::-1]
+        self.row += pix.height
+
+    def result(self):
+        return self.out
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)))
+
+def dib_to_png(dib, level=PNG_COMPRESSION, block_rows=256):
+    """
+    Encode a CF_DIB payload as a PNG file image, keeping its resolution:
+    24-bit DIBs as RGB, gray-palette 8- and 1-bit DIBs as grayscale. Rows are
+    converted with NumPy a block at a time, so the extra memory is one block
+    rather than a second copy of the image.
+    """
+    import numpy as np
+
+    size, width, height, _, bits, compression, _, x_ppm, y_ppm, colors_used, _ = BITMAPINFOHEADER.unpack_from(dib)
+    if bits not in (24, 8, 1) or compression != BI_RGB:
+        raise ValueError(f"Cannot encode a {bits}-bit DIB (compression {compression}) as PNG.")
+    palette_bytes = 4 * (colors_used or (1 << bits)) if bits < 24 else 0
+    bottom_up = height > 0
+    height = abs(height)
+    stride = dib_stride(width, bits)
+    row_bytes = (width * bits + 7) // 8
+    rows = np.frombuffer(dib, dtype=np.uint8, count=stride * height, offset=size + palette_bytes)
+    rows = rows.reshape(height, stride)[::-1 if bottom_up else 1, :row_bytes]
+    block = np.zeros((block_rows, 1 + row_bytes), dtype=np.uint8)  # Filter type None, then the row
+    compressor = zlib.compressobj(level)
+    data = bytearray()
+    for y in range(0, height, block_rows):
+        n = min(block_rows, height - y)
+        if bits == 24:
+            block[:n, 1:].reshape(n, width, 3)[...] = rows[y:y + n].reshape(n, width, 3)[:, :, ::-1]
+        else:
+            # The gray ramp from dib_palette() maps indices straight to PNG gray levels
+            block[:n, 1:] = rows[y:y + n]
+        data += compressor.compress(block[:n])
+    data += compressor.flush()
+    depth, color_type = (8, 2) if bits == 24 else (bits, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, depth, color_type, 0, 0, 0)),
+        _png_chunk(b"pHYs", struct.pack(">IIB", x_ppm, y_ppm, 1)),
+        _png_chunk(b"IDAT", bytes(data)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+def drop_dir():
+    """Directory holding files offered as clipboard file drops; kept across runs so pastes still work."""
+    return os.path.join(tempfile.gettempdir(), "pdf_to_clipboard_drop")
+
+def write_drop_file(data, ext="png"):
+    """Save an image for a clipboard file drop, pruning old ones, and return its path."""
+    directory = drop_dir()
+    os.makedirs(directory, exist_ok=True)
+    cutoff = time.time() - DROP_FILE_MAX_AGE
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass  # Still open in the application it was pasted into
+    path = os.path.join(directory, f"capture-{hashlib.sha1(data).hexdigest()[:12]}.{ext}")
+    if not os.path.exists(path):
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    return path
+
+def hdrop_payload(paths):
+    """Build a CF_HDROP payload (DROPFILES plus a double-NUL-terminated wide file list)."""
+    files = "".join(os.path.abspath(path) + "\0" for path in paths) + "\0"
+    return DROPFILES.pack(DROPFILES.size, 0, 0, 0, 1) + files.encode("utf-16-le")
+
+def pixmap_to_dib(pix, bits_per_pixel=None):
+    """
+    Build a CF_DIB payload directly from the samples of a PyMuPDF pixmap,
+    without intermediate images: BGR rows for RGB pixmaps, an 8-bit gray
+    palette for grayscale ones (or 1-bit black and white if asked).
+    """
+    writer = DibWriter(pix.width, pix.height, pix.xres, bits_per_pixel or (24 if pix.n == 3 else 8))
+    with span("encode.dib"):
+        writer.write(pix)
+    return writer.result()
+
+class Win32ClipboardSink:
+    """Publishes clipboard formats through the Windows clipboard."""
+
+    def publish(self, payloads):
+        import win32clipboard
+        formats = {"CF_DIB": win32clipboard.CF_DIB, "CF_HDROP": win32clipboard.CF_HDROP}
+        for name in payloads:
+            if name not in formats:
+                # Registered formats such as "PNG", which Office and browsers look for by name
+                formats[name] = win32clipboard.RegisterClipboardFormat(name)
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            for name, data in payloads.items():
+                win32clipboard.SetClipboardData(formats[name], data)
+        finally:
+            win32clipboard.CloseClipboard()
+
+class FileClipboardSink:
+    """Stand-in clipboard that writes each format to <directory>/<format>.bin."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, name):
+        # Registered format names such as "image/svg+xml" are not valid file names
+        return os.path.join(self.directory, "{}.bin".format(name.replace("/", "_").replace(" ", "_")))
+
+    def publish(self, payloads):
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                os.remove(os.path.join(self.directory, name))
+        for name, data in payloads.items():
+            with open(self.path_for(name), "wb") as f:
+                f.write(data)
+
+_sink = None
+
+def get_sink():
+    """Return the active clipboard sink (the Windows clipboard where available)."""
+    global _sink
+    if _sink is None:
+        if sys.platform == "win32":
+            _sink = Win32ClipboardSink()
+        else:
+            _sink = FileClipboardSink(os.path.join(tempfile.gettempdir(), "pdf_to_clipboard"))
+    return _sink
+
+def set_sink(sink):
+    """Replace the clipboard sink, e.g. with a FileClipboardSink for testing."""
+    global _sink
+    _sink = sink
+
+def _format_size(size):
+    if size < 1024 * 1024:
+        return f"{size / 1024:.0f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+class PublishStats:
+    """Sizes of the published formats and time spent encoding and publishing them."""
+
+    def __init__(self):
+        self.sizes = {}
+        self.encode_seconds = 0.0
+        self.publish_seconds = 0.0
+
+    def __str__(self):
+        sizes = ", ".join(f"{FORMAT_LABELS.get(name, name)} {_format_size(size)}"
+                          for name, size in self.sizes.items() if name != "CF_HDROP")
+        return f"{sizes}; encoded in {self.encode_seconds:.2f} s, published in {self.publish_seconds:.2f} s"
+
+def set_file_drop(enabled):
+    """Also offer each capture as a file (CF_HDROP; PNG, or SVG for vector captures), e.g. for pasting as an attachment."""
+    global publish_file_drop
+    publish_file_drop = enabled
+
+def copy_dib_to_clipboard(data, sink=None):
+    """
+    Copy a prebuilt CF_DIB payload to the clipboard. Unless disabled, a PNG
+    encoded once from the payload is published next to it, and offered as a
+    file drop when publish_file_drop is set. Returns a PublishStats.
+    """
+    stats = PublishStats()
+    payloads = {}
+    if publish_png or publish_file_drop:
+        start = time.perf_counter()
+        with span("encode.png", bytes=len(data)):
+            png = dib_to_png(data)
+        if publish_file_drop:
+            payloads["CF_HDROP"] = hdrop_payload([write_drop_file(png)])
+        stats.encode_seconds = time.perf_counter() - start
+        if publish_png:
+            payloads["PNG"] = png
+    payloads["CF_DIB"] = data
+    return _publish(payloads, stats, sink)
+
+def copy_vector_to_clipboard(svg, pdf=None, fallback_dib=None, sink=None):
+    """
+    Copy a vector capture: the SVG, the single-page PDF it was cut from, and a
+    screen-resolution CF_DIB (plus PNG) for applications that only paste
+    bitmaps. The SVG is offered as a file drop when publish_file_drop is set.
+    Returns a PublishStats.
+    """
+    stats = PublishStats()
+    payloads = {SVG_FORMAT: svg}
+    if pdf is not None:
+        payloads[PDF_FORMAT] = pdf
+    if publish_file_drop:
+        payloads["CF_HDROP"] = hdrop_payload([write_drop_file(svg, "svg")])
+    if fallback_dib is not None:
+        if publish_png:
+            start = time.perf_counter()
+            with span("encode.png", bytes=len(fallback_dib)):
+                payloads["PNG"] = dib_to_png(fallback_dib)
+            stats.encode_seconds = time.perf_counter() - start
+        payloads["CF_DIB"] = fallback_dib
+    return _publish(payloads, stats, sink)
+
+def _publish(payloads, stats, sink):
+    stats.sizes = {name: len(payload) for name, payload in payloads.items()}
+    start = time.perf_counter()
+    with span("clipboard.publish", bytes=sum(stats.sizes.values())):
+        (sink or get_sink()).publish(payloads)
+    stats.publish_seconds = time.perf_counter() - start
+    return stats
+
+def copy_pixmap_to_clipboard(pix, sink=None):
+    """Copy an RGB pixmap to the clipboard as CF_DIB (plus PNG) and return the PublishStats."""
+    return copy_dib_to_clipboard(pixmap_to_dib(pix), sink)
@@ -0,0 +1,152 @@
+"""
+Cache of open PyMuPDF documents.
+
+Opening a PDF parses its xref table and object streams, which for large files
+costs more than rendering a page. DocumentCache keeps the most recently used
+documents open, keyed by (path, size, mtime): a file that changes on disk is
+reopened and its stale handle closed. MuPDF documents are not thread-safe, so
+a handle is only used while holding its lock (see borrow()).
+"""
+import atexit
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from instrumentation import span
+
+DEFAULT_MAX_DOCUMENTS = 4
+# Open files at least this large from a read-only memory map (None: never). On
+# Windows a mapped file cannot be truncated, so a cached handle would block
+# another program from rewriting the PDF; hence off by default.
+DEFAULT_MMAP_BYTES = None
+
+class _Entry:
+    """One open document, its lock and (if memory-mapped) its mapping."""
+
+    __slots__ = ("doc", "lock", "mapping", "view", "users", "retired")
+
+    def __init__(self, doc, mapping=None, view=None):
+        self.doc = doc
+        self.lock = threading.RLock()
+        self.mapping = mapping
+        self.view = view
+        self.users = 0
+        self.retired = False
+
+    def close(self):
+        self.doc.close()
+        if self.mapping is not None:
+            self.view.release()
+            self.mapping.close()
+
+class DocumentCache:
+    """
+    Least-recently-used set of at most max_documents open documents. Files of
+    mmap_bytes or more are opened from a read-only memory map instead of
+    through MuPDF's buffered file reader.
+    """
+
+    def __init__(self, max_documents=DEFAULT_MAX_DOCUMENTS, mmap_bytes=DEFAULT_MMAP_BYTES):
+        self.max_documents = max_documents
+        self.mmap_bytes = mmap_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (path, size, mtime_ns) -> _Entry
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _open(self, path, size):
+        import fitz  # PyMuPDF
+        with span("pdf.open", bytes=size):
+            if self.mmap_bytes is None or size < max(1, self.mmap_bytes):
+                return _Entry(fitz.open(path))
+            with open(path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # PyMuPDF reads a memoryview in place; bytes(mapping) would copy the whole file
+            view = memoryview(mapping)
+            try:
+                doc = fitz.open(stream=view, filetype=os.path.splitext(path)[1].lstrip(".") or "pdf")
+            except Exception:
+                view.release()
+                mapping.close()
+                raise
+            return _Entry(doc, mapping, view)
+
+    def _retire(self, entries):
+        """Close entries no longer in the cache; ones still borrowed are closed when returned."""
+        for entry in entries:
+            entry.retired = True
+        return [entry for entry in entries if entry.users == 0]
+
+    def _acquire(self, path):
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.users += 1
+                self.hits += 1
+                return entry
+        entry = self._open(path, st.st_size)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Another thread opened it meanwhile; use theirs
+                stale = [entry]
+                entry = existing
+                self._entries.move_to_end(key)
+            else:
+                # Older versions of the same file are never asked for again
+                stale = [self._entries.pop(k) for k in list(self._entries) if k[0] == path]
+                self._entries[key] = entry
+                while len(self._entries) > self.max_documents:
+                    stale.append(self._entries.popitem(last=False)[1])
+                self.misses += 1
+            entry.users += 1
+            to_close = self._retire(stale)
+        for old in to_close:
+            old.close()
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            close = entry.retired and entry.users == 0
+        if close:
+            entry.close()
+
+    @contextmanager
+    def borrow(self, path):
+        """Hold the open document for path (opening it if needed) for the duration of a with block."""
+        entry = self._acquire(os.path.abspath(path))
+        try:
+            with entry.lock:
+                yield entry.doc
+        finally:
+            self._release(entry)
+
+    def close_all(self):
+        """Close every cached document; borrowed ones are closed when returned."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            to_close = self._retire(entries)
+        for entry in to_close:
+            entry.close()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "open": len(self._entries)}
+
+_documents = None
+
+def get_documents():
+    """Shared document cache, closed when the process exits."""
+    global _documents
+    if _documents is None:
+        _documents = DocumentCache()
+        atexit.register(_documents.close_all)
+    return _documents
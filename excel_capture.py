@@ -1,33 +1,34 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import xlwings as xw
-import fitz  # PyMuPDF
-from PIL import Image
-import win32clipboard
-import io
+from clipboard import copy_dib_to_clipboard, copy_vector_to_clipboard, pixmap_to_dib, set_file_drop
+from excel_session import get_pool, init_com_thread
+from jobs import JobExecutor, stage
+import instrumentation
+import startup
+from prefetch import Prefetcher, neighbours
+from excel_layout import split_range_into_pages
+from pagination import PAPER_SIZES
+from excel_export import get_pages_pdf
+from render_cache import get_cache, make_key
+from render_engine import PREVIEW_DPI, QUALITY_TO_DPI, RENDER_MODE_LABELS, VECTOR_FALLBACK_DPI, VECTOR_QUALITY, page_dib, page_pixmap, thumbnail, vector_payloads
 import os
 import sys
-import tempfile
 
-# Constants for A4 dimensions in cm
-A4_SIZES = {
-    'portrait':  {'width_cm': 21.0, 'height_cm': 29.7},
-    'landscape': {'width_cm': 29.7, 'height_cm': 21.0},
-}
+# Global variable to store page ranges
+pages = []
 
-# Conversion factors
-POINTS_TO_CM = 0.03528       # 1 point = 0.03528 cm
-EXCEL_UNIT_TO_CM = 0.142     # Approx for Calibri 11 at 100% zoom
+# Warm Excel instances and open workbooks shared by every operation
+session_pool = get_pool()
 
-# Quality to DPI mapping (updated)
-QUALITY_TO_DPI = {
-    "Low Quality": 100,
-    "Medium Quality": 300,
-    "High Quality": 600
-}
+# Excel and rendering work runs on one background thread (COM objects stay on
+# the thread that created them) so the window never freezes
+job_executor = JobExecutor(initializer=init_com_thread)
 
-# Global variable to store page ranges
-pages = []
+# Pages next to the last capture, rendered ahead of time on the same worker
+prefetcher = Prefetcher(job_executor)
+
+# Largest size of the preview thumbnail shown in the window
+PREVIEW_SIZE = (240, 240)
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and PyInstaller"""
@@ -39,160 +40,113 @@ def resource_path(relative_path):
 
 def get_sheet_names(file_path):
     """Retrieve sheet names from the selected Excel file."""
-    app = xw.App(visible=False)
-    wb = app.books.open(file_path)
-    sheet_names = [sheet.name for sheet in wb.sheets]
-    wb.close()
-    app.quit()
-    return sheet_names
-
-def split_range_into_pages(temp_file_path: str, sheet_name: str, range_address: str, orientation: str = 'landscape'):
+    with session_pool.book(file_path) as wb:
+        return [sheet.name for sheet in wb.sheets]
+
+def page_render(file_path, sheet_name, page_ranges, page_num, orientation, dpi, paper="A4", mode="color"):
+    """Cache key and render function producing the CF_DIB payload for one page of the range in a render mode."""
+    def render():
+        import fitz  # PyMuPDF
+
+        # Export every page of the range once; later captures reuse the cached PDF
+        stage("Exporting from Excel")
+        pages_pdf = get_pages_pdf(file_path, sheet_name, page_ranges, orientation, paper)
+        
+        # Render the PDF page with PyMuPDF straight into a CF_DIB payload
+        stage("Rendering")
+        doc = fitz.open(pages_pdf)
+        page = doc.load_page(page_num - 1)
+        data = page_dib(page, dpi, mode=mode)
+        doc.close()
+        return data
+    
+    # Repeat captures of the same workbook content and page are served from the cache
+    page_key = (sheet_name, page_ranges[page_num - 1], orientation, paper)
+    return make_key(file_path, page_key, dpi, colorspace=mode), render
+
+def capture_page(file_path, sheet_name, page_ranges, page_num, orientation, dpi, paper="A4", mode="color"):
+    """Capture one page of the range as an image with given DPI and copy to clipboard."""
+    key, render = page_render(file_path, sheet_name, page_ranges, page_num, orientation, dpi, paper, mode)
+    # The disk copy of a new render is written after the clipboard is updated
+    with get_cache().rendered(key, lambda: prefetcher.take(key) or render()) as data:
+        stage("Copying to clipboard")
+        return copy_dib_to_clipboard(data)
+
+def capture_preview(file_path, sheet_name, page_ranges, page_num, orientation, dpi, paper="A4", mode="color"):
     """
-    Splits the given Excel range into page-sized sub-ranges for A4 printing using a temporary file.
-    Returns a list of A1 address ranges for each page.
+    Copy a quick low-DPI capture of the page to the clipboard and return a PPM
+    thumbnail for the preview pane. Returns None without copying when the
+    full-quality capture is already cached or prefetched. Black & white
+    previews stay grayscale, as thresholding at low DPI breaks up text.
     """
-    wb = xw.Book(temp_file_path)
-    sht = wb.sheets[sheet_name]
-    rng = sht.range(range_address)
-    
-    col_widths_cm = [c.column_width * EXCEL_UNIT_TO_CM for c in rng.columns]
-    row_heights_cm = [r.row_height * POINTS_TO_CM for r in rng.rows]
-    
-    total_width_cm = sum(col_widths_cm)
-    page_w_cm = A4_SIZES[orientation]['width_cm']
-    page_h_cm = A4_SIZES[orientation]['height_cm']
-    
-    scale = page_w_cm / total_width_cm
-    max_original_height_cm = page_h_cm / scale
-    
-    pages_list = []
-    start_idx = 0
-    n_rows = len(row_heights_cm)
-    
-    while start_idx < n_rows:
-        acc = 0.0
-        end_idx = start_idx
-        while end_idx < n_rows and (acc + row_heights_cm[end_idx]) <= max_original_height_cm:
-            acc += row_heights_cm[end_idx]
-            end_idx += 1
-        if end_idx == start_idx:
-            end_idx += 1
-        pages_list.append((start_idx, end_idx - 1))
-        start_idx = end_idx
-    
-    page_ranges = []
-    top_row = rng.row
-    left_col = rng.column
-    for (r0, r1) in pages_list:
-        start_cell = sht.cells[top_row - 1 + r0, left_col - 1]
-        end_cell = sht.cells[top_row - 1 + r1, left_col - 1 + rng.columns.count - 1]
-        page_ranges.append(f"{start_cell.address}:{end_cell.address}")
-    
-    wb.close()
-    return page_ranges
-
-def export_range_to_pdf(temp_file_path, sheet_name, range_address, orientation):
-    """Export the specified Excel range to a temporary PDF with correct orientation and scaling."""
-    # Initialize Excel application (invisible)
-    app = xw.App(visible=False)
-    wb = app.books.open(temp_file_path)
-    sht = wb.sheets[sheet_name]
-    
-    # Set the print area to the specified range
-    sht.api.PageSetup.PrintArea = range_address
-    
-    # Set the orientation based on user selection
-    if orientation == "landscape":
-        sht.api.PageSetup.Orientation = 2  # xlLandscape
-    else:
-        sht.api.PageSetup.Orientation = 1  # xlPortrait
-    
-    # Configure scaling to fit the range to one page
-    sht.api.PageSetup.Zoom = False          # Disable zoom to enable FitToPages
-    sht.api.PageSetup.FitToPagesWide = 1    # Fit to 1 page wide
-    sht.api.PageSetup.FitToPagesTall = 1    # Fit to 1 page tall
-    
-    # Export the sheet to a temporary PDF
-    temp_pdf = os.path.join(tempfile.gettempdir(), "temp_excel_page.pdf")
-    sht.to_pdf(temp_pdf)
-    
-    # Clean up
-    wb.close()
-    app.quit()
-    
-    return temp_pdf
+    import fitz  # PyMuPDF
+    key, _ = page_render(file_path, sheet_name, page_ranges, page_num, orientation, dpi, paper, mode)
+    if key in get_cache() or key in prefetcher.buffer:
+        return None
+    stage("Exporting from Excel")
+    pages_pdf = get_pages_pdf(file_path, sheet_name, page_ranges, orientation, paper)
+    stage("Rendering preview")
+    doc = fitz.open(pages_pdf)
+    pix = page_pixmap(doc.load_page(page_num - 1), PREVIEW_DPI, gray=mode != "color")
+    doc.close()
+    copy_dib_to_clipboard(pixmap_to_dib(pix))
+    return thumbnail(pix, *PREVIEW_SIZE).tobytes("ppm")
 
-def capture_page(temp_file_path, sheet_name, range_address, orientation, dpi):
-    """Capture the specified range as an image with given DPI and copy to clipboard."""
-    # Export range to temporary PDF with correct orientation
-    temp_pdf = export_range_to_pdf(temp_file_path, sheet_name, range_address, orientation)
-    
-    # Render PDF page with PyMuPDF
-    doc = fitz.open(temp_pdf)
-    page = doc.load_page(0)  # Single page from exported range
-    zoom = dpi / 72  # PyMuPDF default resolution is 72 DPI
-    mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
-    img_data = pix.tobytes("png")
-    
-    # Convert to PIL Image for clipboard
-    image = Image.open(io.BytesIO(img_data))
-    
-    # Save image to bytes buffer for clipboard (BMP format)
-    with io.BytesIO() as output:
-        image.save(output, format="BMP")
-        data = output.getvalue()[14:]  # Skip BMP header
-    
-    # Copy to clipboard
-    win32clipboard.OpenClipboard()
-    win32clipboard.EmptyClipboard()
-    win32clipboard.SetClipboardData(win32clipboard.CF_DIB, data)
-    win32clipboard.CloseClipboard()
-    
+def capture_vector(file_path, sheet_name, page_ranges, page_num, orientation, paper="A4"):
+    """Copy one page of the range as SVG and a one-page PDF, with a screen-resolution bitmap for image-only applications."""
+    import fitz  # PyMuPDF
+    stage("Exporting from Excel")
+    pages_pdf = get_pages_pdf(file_path, sheet_name, page_ranges, orientation, paper)
+    stage("Exporting vectors")
+    doc = fitz.open(pages_pdf)
+    page = doc.load_page(page_num - 1)
+    svg, pdf = vector_payloads(page)
+    fallback_dib = page_dib(page, VECTOR_FALLBACK_DPI)
     doc.close()
-    os.remove(temp_pdf)  # Clean up temporary PDF
+    stage("Copying to clipboard")
+    return copy_vector_to_clipboard(svg, pdf, fallback_dib)
+
+def prefetch_neighbours(file_path, sheet_name, page_ranges, page_num, orientation, dpi, paper="A4", mode="color"):
+    """Render the pages either side of page_num in the background with the same settings."""
+    def renders():
+        # Runs on the worker, as make_key() hashes the workbook
+        return [(f"Prefetch page {n}",) + page_render(file_path, sheet_name, page_ranges, n, orientation, dpi, paper, mode)
+                for n in neighbours(page_num, len(page_ranges))]
+    context = (file_path, sheet_name, tuple(page_ranges), orientation, dpi, paper, mode)
+    prefetcher.schedule_later(context, renders)
 
 def calculate_pages():
     """Calculate and display the total number of pages based on inputs."""
-    global pages
     file_path = excel_path.get()
     sheet_name = sheet_name_var.get()
     range_address = range_address_var.get()
     orientation = orientation_var.get().lower()
+    paper = paper_var.get()
     
     if not file_path or not sheet_name or not range_address or not orientation:
         messagebox.showerror("Error", "Please provide all inputs (Excel file, sheet name, cell range, orientation).")
         return
     
-    try:
-        # Create a temporary copy of the sheet
-        temp_file_path = create_temp_sheet_copy(file_path, sheet_name)
-        pages = split_range_into_pages(temp_file_path, sheet_name, range_address, orientation)
+    pages_wide_str = pages_wide_var.get()
+    if not pages_wide_str.isdigit() or int(pages_wide_str) < 1:
+        messagebox.showerror("Error", "Pages Wide must be a positive integer.")
+        return
+    
+    def on_done(job, result):
+        global pages
+        pages = result
         total_pages_var.set(f"Total Pages: {len(pages)}")
         status_var.set(f"Calculated {len(pages)} pages.")
-        os.remove(temp_file_path)  # Clean up temporary file
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to calculate pages: {str(e)}")
-        status_var.set("Ready")
-
-def create_temp_sheet_copy(file_path, sheet_name):
-    """Create a temporary copy of the specified sheet in a new workbook."""
-    app = xw.App(visible=False)
-    original_wb = app.books.open(file_path)
-    temp_wb = app.books.add()
-    original_sheet = original_wb.sheets[sheet_name]
-    original_sheet.copy(after=temp_wb.sheets[0])
-    temp_wb.sheets[0].delete()  # Remove the default sheet
-    temp_file_path = os.path.join(tempfile.gettempdir(), "temp_excel_sheet.xlsx")
-    temp_wb.save(temp_file_path)
-    original_wb.close()
-    temp_wb.close()
-    app.quit()
-    return temp_file_path
+        update_queue_status()
+    
+    # Geometry is read from the workbook itself, so no Excel copy is needed
+    job_executor.submit(split_range_into_pages, file_path, sheet_name, range_address, orientation,
+                        paper, int(pages_wide_str), name="Calculating pages", on_done=on_done,
+                        on_error=job_error_handler("Failed to calculate pages"), on_progress=on_job_progress)
+    update_queue_status()
 
 def capture_and_copy():
     """Capture the selected page and copy it to the clipboard."""
-    global pages
     if not pages:
         messagebox.showerror("Error", "Please calculate pages first.")
         return
@@ -207,43 +161,116 @@ def capture_and_copy():
         messagebox.showerror("Error", f"Page number must be between 1 and {len(pages)}.")
         return
     
-    range_address = pages[page_num - 1]
     quality = quality_var.get()
-    dpi = QUALITY_TO_DPI[quality]
     file_path = excel_path.get()
     sheet_name = sheet_name_var.get()
     orientation = orientation_var.get().lower()
+    paper = paper_var.get()
+    mode = RENDER_MODE_LABELS[mode_var.get()]
     
-    try:
-        status_var.set("Processing...")
-        root.update_idletasks()
-        
-        # Create a temporary copy of the sheet
-        temp_file_path = create_temp_sheet_copy(file_path, sheet_name)
-        capture_page(temp_file_path, sheet_name, range_address, orientation, dpi)
-        os.remove(temp_file_path)  # Clean up temporary file
-        
-        status_var.set(f"Page {page_num} copied to clipboard!")
-        messagebox.showinfo("Success", f"Page {page_num} has been copied to the clipboard!")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to capture page: {str(e)}")
+    if quality == VECTOR_QUALITY:
+        # Vector output is small and quick, so there is no preview or prefetch
+        prefetcher.cancel()
+        job_executor.submit(capture_vector, file_path, sheet_name, list(pages), page_num, orientation, paper,
+                            name=f"Page {page_num}", on_done=on_vector_done,
+                            on_error=job_error_handler("Failed to capture page"), on_progress=on_job_progress)
+        update_queue_status()
+        return
+    dpi = QUALITY_TO_DPI[quality]
+    
+    # Captures run in the background; further clicks queue up behind this one.
+    # Outstanding prefetches are dropped so they do not delay the capture.
+    prefetcher.cancel()
+    if progressive_var.get():
+        # A low-DPI copy lands on the clipboard first; the full capture replaces it
+        job_executor.submit(capture_preview, file_path, sheet_name, list(pages), page_num, orientation, dpi, paper, mode,
+                            name=f"Page {page_num}", on_done=on_preview_done,
+                            on_error=job_error_handler("Failed to capture preview"), on_progress=on_job_progress)
+    job_executor.submit(capture_page, file_path, sheet_name, list(pages), page_num, orientation, dpi, paper, mode,
+                        name=f"Page {page_num}", on_done=on_capture_done,
+                        on_error=job_error_handler("Failed to capture page"), on_progress=on_job_progress)
+    update_queue_status()
+
+def show_preview(ppm):
+    """Show a PPM thumbnail in the preview pane."""
+    image = tk.PhotoImage(data=ppm)
+    preview_label.configure(image=image, text="")
+    preview_label.image = image  # Keep a reference so Tk does not drop it
+
+def on_preview_done(job, ppm):
+    if ppm is None:
+        return
+    show_preview(ppm)
+    message = f"{job.name}: preview copied, rendering full quality..."
+    status_var.set(message)
+    update_queue_status(message)
+
+def on_capture_done(job, stats):
+    status_var.set(f"{job.name} copied to clipboard ({stats})")
+    if prefetch_var.get():
+        prefetch_neighbours(*job.args)
+    if not job_executor.pending():
+        messagebox.showinfo("Success", f"{job.name} has been copied to the clipboard!")
+    update_queue_status()
+
+def on_vector_done(job, stats):
+    status_var.set(f"{job.name} copied to clipboard as vectors ({stats})")
+    if not job_executor.pending():
+        messagebox.showinfo("Success", f"{job.name} has been copied to the clipboard!")
+    update_queue_status()
+
+def update_queue_status(current=None):
+    """Show the running job's stage and how many jobs are waiting."""
+    pending = job_executor.pending()
+    if not pending:
+        return
+    text = current or f"{pending[0].name}: Processing..."
+    # A progressive capture is a preview job plus a full job under one name
+    queued = len({job.name for job in pending}) - 1
+    if queued:
+        text += f" ({queued} queued)"
+    status_var.set(text)
+
+def on_job_progress(job, stage_name):
+    update_queue_status(f"{job.name}: {stage_name}...")
+
+def job_error_handler(message):
+    """Error callback that reports a failed background job."""
+    def on_error(job, e):
+        messagebox.showerror("Error", f"{message}: {str(e)}")
         status_var.set("Ready")
+        update_queue_status()
+    return on_error
+
+def on_prefetch_toggle():
+    prefetcher.enabled = prefetch_var.get()
+    if not prefetcher.enabled:
+        prefetcher.reset()
+
+def cancel_jobs():
+    """Cancel the running job and any queued ones."""
+    job_executor.cancel_all()
+    status_var.set("Cancelled")
 
 def browse_excel():
     """Open a file dialog to select an Excel file and populate sheet names."""
     file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xls *.xlsx")])
     if file_path:
         excel_path.set(file_path)
-        try:
-            sheet_names = get_sheet_names(file_path)
-            sheet_name_dropdown['values'] = sheet_names
-            if sheet_names:
-                sheet_name_var.set(sheet_names[0])  # Default to the first sheet
-            else:
-                sheet_name_var.set("")
-            update_calculate_button_state()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load sheet names: {str(e)}")
+        job_executor.submit(get_sheet_names, file_path, name="Loading sheets", on_done=on_sheet_names,
+                            on_error=job_error_handler("Failed to load sheet names"), on_progress=on_job_progress)
+        update_queue_status()
+
+def on_sheet_names(job, sheet_names):
+    """Populate the sheet dropdown once the workbook has been read."""
+    sheet_name_dropdown['values'] = sheet_names
+    if sheet_names:
+        sheet_name_var.set(sheet_names[0])  # Default to the first sheet
+    else:
+        sheet_name_var.set("")
+    update_calculate_button_state()
+    status_var.set("Ready")
+    update_queue_status()
 
 def update_calculate_button_state():
     """Enable Calculate Pages button only when all inputs are provided."""
@@ -252,37 +279,65 @@ def update_calculate_button_state():
     else:
         calculate_button.config(state="disabled")
 
+def on_layout_change():
+    """Re-paginate straight away when the page layout changes after pages were calculated."""
+    update_calculate_button_state()
+    if pages and pages_wide_var.get().isdigit():
+        calculate_pages()
+
 def show_help():
     """Display help instructions."""
     messagebox.showinfo("Help", """How to Use:
 1. Select an Excel file using 'Browse'. The sheet names will be loaded automatically.
 2. Choose the sheet name from the dropdown.
 3. Enter the cell range (e.g., B2:AD88).
-4. Choose the orientation (Portrait or Landscape).
-5. Click 'Calculate Pages' to see the total number of pages.
+4. Choose the orientation (Portrait or Landscape), paper size, and how many pages wide to fit the range.
+5. Click 'Calculate Pages' to see the total number of pages. Changing the layout afterwards recalculates instantly.
 6. Enter the page number you want to capture.
 7. Choose the quality level.
 8. Click 'Capture and Copy' to copy the page image to your clipboard.
+   Captures run in the background; click again to queue more pages, or 'Cancel' to stop.
+   With 'Prefetch' ticked, the pages either side are rendered ahead of time.
+   The image is copied as a bitmap and a compressed PNG; with 'Copy as file'
+   ticked it can also be pasted as a PNG file, e.g. as an attachment.
+   With 'Preview first' ticked, a quick low-resolution copy is shown and put on the
+   clipboard straight away, then replaced by the full-quality image.
 
 Quality Levels:
 - Low Quality: 100 DPI (less detailed)
 - Medium Quality: 300 DPI (balanced)
-- High Quality: 600 DPI (highly detailed)""")
+- High Quality: 600 DPI (highly detailed)
+- Fit 8 MP / Fit 4000 px / Fit 8 MB: the highest DPI at which each page stays
+  under 8 megapixels, 4000 pixels along its long edge, or an 8 MB image
+- Vector (SVG): sharp at any zoom and far smaller; pastes as SVG where supported,
+  otherwise as a screen-resolution image
+
+Render Modes:
+- Grayscale: a third of the size of Color
+- Black & White: pure black or white pixels, 24x smaller; best for line drawings""")
 
 def close_window():
     """Gracefully close the GUI."""
+    job_executor.cancel_all()
+    # Excel instances must be quit from the worker thread that started them
+    job_executor.submit(session_pool.close)
+    job_executor.shutdown()
     root.destroy()
 
+# --timings / --timings-log PATH / --profile PATH report where capture time goes
+instrumentation.configure_from_argv()
+
 # Set up GUI
 root = tk.Tk()
 root.title("Excel Page Screenshot Tool")
-root.geometry("600x350")
+root.geometry("860x390")
 root.resizable(False, False)
 root.protocol("WM_DELETE_WINDOW", close_window)
 
 # Excel file selection
 excel_path = tk.StringVar()
 excel_path.trace("w", lambda *args: update_calculate_button_state())
+excel_path.trace("w", lambda *args: prefetcher.reset())
 tk.Label(root, text="Excel File:").grid(row=0, column=0, padx=10, pady=10, sticky="e")
 tk.Entry(root, textvariable=excel_path, width=40, state="readonly").grid(row=0, column=1, columnspan=2, padx=5, pady=10)
 tk.Button(root, text="Browse", command=browse_excel).grid(row=0, column=3, padx=5, pady=10)
@@ -290,6 +345,7 @@ tk.Button(root, text="Browse", command=browse_excel).grid(row=0, column=3, padx=
 # Sheet name dropdown
 sheet_name_var = tk.StringVar()
 sheet_name_var.trace("w", lambda *args: update_calculate_button_state())
+sheet_name_var.trace("w", lambda *args: prefetcher.reset())
 tk.Label(root, text="Sheet Name:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
 sheet_name_dropdown = ttk.Combobox(root, textvariable=sheet_name_var, state="readonly")
 sheet_name_dropdown.grid(row=1, column=1, columnspan=2, padx=5, pady=10)
@@ -302,39 +358,72 @@ tk.Entry(root, textvariable=range_address_var, width=40).grid(row=2, column=1, c
 
 # Orientation
 orientation_var = tk.StringVar(value="Landscape")
-orientation_var.trace("w", lambda *args: update_calculate_button_state())
+orientation_var.trace("w", lambda *args: on_layout_change())
 tk.Label(root, text="Orientation:").grid(row=3, column=0, padx=10, pady=10, sticky="e")
 orientation_dropdown = ttk.Combobox(root, textvariable=orientation_var, values=["Portrait", "Landscape"], state="readonly")
 orientation_dropdown.grid(row=3, column=1, padx=5, pady=10)
 
+# Paper size and fit
+paper_var = tk.StringVar(value="A4")
+paper_var.trace("w", lambda *args: on_layout_change())
+tk.Label(root, text="Paper Size:").grid(row=4, column=0, padx=10, pady=10, sticky="e")
+paper_dropdown = ttk.Combobox(root, textvariable=paper_var, values=list(PAPER_SIZES), state="readonly")
+paper_dropdown.grid(row=4, column=1, padx=5, pady=10)
+pages_wide_var = tk.StringVar(value="1")
+pages_wide_var.trace("w", lambda *args: on_layout_change())
+tk.Label(root, text="Pages Wide:").grid(row=4, column=2, padx=10, pady=10, sticky="e")
+tk.Spinbox(root, from_=1, to=20, textvariable=pages_wide_var, width=5).grid(row=4, column=3, padx=5, pady=10, sticky="w")
+
 # Calculate pages button
 calculate_button = tk.Button(root, text="Calculate Pages", command=calculate_pages, state="disabled")
-calculate_button.grid(row=4, column=1, pady=10)
+calculate_button.grid(row=5, column=1, pady=10)
 
 # Total pages label
 total_pages_var = tk.StringVar(value="Total Pages: N/A")
-tk.Label(root, textvariable=total_pages_var).grid(row=4, column=2, padx=10, pady=10)
+tk.Label(root, textvariable=total_pages_var).grid(row=5, column=2, padx=10, pady=10)
 
 # Page number
 page_num_var = tk.StringVar()
-tk.Label(root, text="Page Number:").grid(row=5, column=0, padx=10, pady=10, sticky="e")
-tk.Entry(root, textvariable=page_num_var, width=10).grid(row=5, column=1, padx=5, pady=10)
+tk.Label(root, text="Page Number:").grid(row=6, column=0, padx=10, pady=10, sticky="e")
+tk.Entry(root, textvariable=page_num_var, width=10).grid(row=6, column=1, padx=5, pady=10)
+prefetch_var = tk.BooleanVar(value=True)
+tk.Checkbutton(root, text="Prefetch", variable=prefetch_var, command=on_prefetch_toggle).grid(row=6, column=2, padx=5, pady=10, sticky="w")
+file_drop_var = tk.BooleanVar(value=False)
+tk.Checkbutton(root, text="Copy as file", variable=file_drop_var,
+               command=lambda: set_file_drop(file_drop_var.get())).grid(row=6, column=3, padx=5, pady=10, sticky="w")
 
 # Quality
 quality_var = tk.StringVar(value="Medium Quality")
-tk.Label(root, text="Quality:").grid(row=6, column=0, padx=10, pady=10, sticky="e")
-quality_dropdown = ttk.Combobox(root, textvariable=quality_var, values=["Low Quality", "Medium Quality", "High Quality"], state="readonly")
-quality_dropdown.grid(row=6, column=1, padx=5, pady=10)
+quality_var.trace("w", lambda *args: prefetcher.reset())
+tk.Label(root, text="Quality:").grid(row=7, column=0, padx=10, pady=10, sticky="e")
+quality_dropdown = ttk.Combobox(root, textvariable=quality_var, values=list(QUALITY_TO_DPI) + [VECTOR_QUALITY], state="readonly")
+quality_dropdown.grid(row=7, column=1, padx=5, pady=10)
+progressive_var = tk.BooleanVar(value=True)
+tk.Checkbutton(root, text="Preview first", variable=progressive_var).grid(row=7, column=2, padx=5, pady=10, sticky="w")
+mode_var = tk.StringVar(value="Color")
+mode_var.trace("w", lambda *args: prefetcher.reset())
+mode_dropdown = ttk.Combobox(root, textvariable=mode_var, values=list(RENDER_MODE_LABELS), state="readonly", width=13)
+mode_dropdown.grid(row=7, column=3, padx=5, pady=10, sticky="w")
 
-# Capture button
-tk.Button(root, text="Capture and Copy", command=capture_and_copy).grid(row=7, column=1, pady=10)
+# Capture and cancel buttons
+tk.Button(root, text="Capture and Copy", command=capture_and_copy).grid(row=8, column=1, pady=10)
+tk.Button(root, text="Cancel", command=cancel_jobs).grid(row=8, column=2, pady=10)
 
 # Status label
 status_var = tk.StringVar(value="Ready")
-tk.Label(root, textvariable=status_var).grid(row=8, column=0, columnspan=4, pady=10)
+tk.Label(root, textvariable=status_var).grid(row=9, column=0, columnspan=4, pady=10)
 
 # Help button
-tk.Button(root, text="Help", command=show_help).grid(row=9, column=1, pady=10)
+tk.Button(root, text="Help", command=show_help).grid(row=10, column=1, pady=10)
+
+# Preview pane
+preview_frame = tk.Frame(root, width=PREVIEW_SIZE[0], height=PREVIEW_SIZE[1], relief="sunken", borderwidth=1)
+preview_frame.grid(row=0, column=4, rowspan=11, padx=10, pady=10)
+preview_frame.grid_propagate(False)
+preview_label = tk.Label(preview_frame, text="No preview")
+preview_label.place(relx=0.5, rely=0.5, anchor="center")
 
 # Start the GUI
+job_executor.attach(root)
+startup.on_first_paint(root, startup.HEAVY_MODULES + ("xlwings",))  # Heavy imports once the window is up
 root.mainloop()
\ No newline at end of file
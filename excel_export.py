@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from excel_session import get_pool
+from instrumentation import span
+from pagination import XL_PAPER_SIZES
+from render_engine import MUPDF_LOCK
+from workspace import Workspace, workspace_root
+
+# Excel rejects PageSetup.PrintArea strings longer than this
+PRINT_AREA_MAX_LEN = 255
+
+_export_dir = None
+_locks = {}  # cached file name -> lock held while that file is produced
+_locks_lock = threading.Lock()
+_sheet_copies = {}  # (workbook path, sheet) -> copy of its latest revision
+
+def export_dir():
+    """
+    Per-process directory holding exported PDFs and sheet copies. It lives in
+    the workspace root, so it is removed at exit and swept after a crash.
+    """
+    global _export_dir
+    if _export_dir is None:
+        _export_dir = os.path.join(workspace_root(), "exports")
+        os.makedirs(_export_dir, exist_ok=True)
+    return _export_dir
+
+def _cache_name(key):
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+
+def _lock_for(name):
+    with _locks_lock:
+        return _locks.setdefault(name, threading.Lock())
+
+def create_temp_sheet_copy(file_path, sheet_name, work):
+    """Create a copy of the specified sheet in a new workbook inside the job's workspace."""
+    session_pool = get_pool()
+    temp_file_path = work.path("sheet.xlsx")
+    with session_pool.book(file_path) as original_wb, span("excel.copy_sheet"):
+        temp_wb = session_pool.backend.add_book(original_wb.app)
+        try:
+            original_sheet = original_wb.sheets[sheet_name]
+            original_sheet.copy(after=temp_wb.sheets[0])
+            temp_wb.sheets[0].delete()  # Remove the default sheet
+            temp_wb.save(temp_file_path)
+        finally:
+            session_pool.backend.close_book(temp_wb)
+    return temp_file_path
+
+def get_sheet_copy(file_path, sheet_name):
+    """
+    Return a single-sheet workbook copy of sheet_name, made once per workbook
+    revision (path and mtime) and shared by every export of that sheet. When
+    the workbook is saved again the next call makes a fresh copy and deletes
+    the old one.
+    """
+    source = (os.path.normcase(os.path.abspath(file_path)), sheet_name)
+    name = _cache_name(source + (os.path.getmtime(file_path),))
+    copy_path = os.path.join(export_dir(), f"sheet_{name}.xlsx")
+    with _lock_for(name):
+        if not os.path.exists(copy_path):
+            with Workspace("sheet") as work:
+                os.replace(create_temp_sheet_copy(file_path, sheet_name, work), copy_path)
+    with _locks_lock:
+        stale = _sheet_copies.get(source)
+        _sheet_copies[source] = copy_path
+    if stale is not None and stale != copy_path:
+        get_pool().forget(stale)
+        try:
+            os.remove(stale)
+        except OSError:
+            pass  # Still open in another Excel instance; removed with the export directory
+    return copy_path
+
+def apply_page_setup(sht, print_area, orientation, paper="A4"):
+    """Set the print area, orientation and paper size, fitting each area to one page."""
+    page_setup = sht.api.PageSetup
+    page_setup.PrintArea = print_area
+    page_setup.Orientation = 2 if orientation == "landscape" else 1  # xlLandscape / xlPortrait
+    page_setup.PaperSize = XL_PAPER_SIZES[paper]
+    page_setup.Zoom = False          # Disable zoom to enable FitToPages
+    page_setup.FitToPagesWide = 1
+    page_setup.FitToPagesTall = 1
+
+def chunk_print_areas(page_ranges, max_len=PRINT_AREA_MAX_LEN):
+    """Group page ranges into comma-joined print areas that Excel will accept."""
+    chunk = []
+    for address in page_ranges:
+        if chunk and len(",".join(chunk + [address])) > max_len:
+            yield chunk
+            chunk = []
+        chunk.append(address)
+    if chunk:
+        yield chunk
+
+def export_pages_to_pdf(temp_file_path, sheet_name, page_ranges, orientation, pdf_path, work, paper="A4"):
+    """
+    Export every page range to a single PDF with one page per range. Ranges are
+    set as a multi-area print area (each area prints on its own page), so the
+    whole range costs one export per PRINT_AREA_MAX_LEN characters of addresses.
+    Intermediate exports are written to the job's workspace.
+    """
+    import fitz  # PyMuPDF
+    session_pool = get_pool()
+    part_pdf = work.path("part.pdf")
+    with MUPDF_LOCK:
+        merged = fitz.open()
+    try:
+        # The sheet copy never changes on disk, so it stays open for the next export
+        with session_pool.book(temp_file_path) as wb:
+            sht = wb.sheets[sheet_name]
+            for chunk in chunk_print_areas(page_ranges):
+                apply_page_setup(sht, ",".join(chunk), orientation, paper)
+                with span("excel.to_pdf", areas=len(chunk)):
+                    sht.to_pdf(part_pdf)
+                with MUPDF_LOCK, fitz.open(part_pdf) as part:
+                    spilled = part.page_count != len(chunk)
+                    if not spilled:
+                        merged.insert_pdf(part)
+                if spilled:
+                    # Excel spilled an area over several pages; export the areas one by one
+                    for address in chunk:
+                        apply_page_setup(sht, address, orientation, paper)
+                        with span("excel.to_pdf", areas=1):
+                            sht.to_pdf(part_pdf)
+                        with MUPDF_LOCK, fitz.open(part_pdf) as single:
+                            merged.insert_pdf(single, from_page=0, to_page=0)
+        with span("pdf.save_merged"), MUPDF_LOCK:
+            merged.save(pdf_path)
+    finally:
+        with MUPDF_LOCK:
+            merged.close()
+    return pdf_path
+
+def get_pages_pdf(file_path, sheet_name, page_ranges, orientation, paper="A4"):
+    """
+    Return a PDF holding one page per entry of page_ranges, exporting it only
+    when no export exists yet for this (workbook mtime, sheet, ranges,
+    orientation, paper). Later page captures are plain PyMuPDF page loads,
+    and a new export of the same workbook revision reuses its sheet copy.
+    Concurrent requests for the same export wait for the first one instead
+    of exporting again.
+    """
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path), sheet_name,
+           tuple(page_ranges), orientation, paper)
+    name = _cache_name(key)
+    pdf_path = os.path.join(export_dir(), f"{name}.pdf")
+    with _lock_for(name):
+        if not os.path.exists(pdf_path):
+            temp_file_path = get_sheet_copy(file_path, sheet_name)
+            # Everything but the finished PDF lives in the workspace, removed even if Excel fails
+            with Workspace("export") as work:
+                tmp_pdf = work.path("pages.pdf")
+                export_pages_to_pdf(temp_file_path, sheet_name, page_ranges, orientation, tmp_pdf, work, paper)
+                os.replace(tmp_pdf, pdf_path)  # Same temp filesystem, so atomic
+    return pdf_path
@@ -0,0 +1,43 @@
+"""
+Splitting a worksheet range into printed pages.
+
+Column widths and row heights are read straight from the workbook file where
+the format allows (see sheet_geometry), falling back to Excel otherwise, and
+indexed once per workbook revision (see pagination), so changing the paper or
+orientation only re-runs the page break search.
+"""
+from excel_session import get_pool
+from pagination import get_index, page_addresses
+from sheet_geometry import GeometryError, parse_range, read_geometry
+
+# Conversion factors
+POINTS_TO_CM = 0.03528       # 1 point = 0.03528 cm
+EXCEL_UNIT_TO_CM = 0.142     # Approx for Calibri 11 at 100% zoom
+
+def get_range_geometry(file_path, sheet_name, range_address):
+    """Return column widths (characters) and row heights (points) for the range."""
+    try:
+        # Read COLINFO/ROW records (or <cols>/<row ht>) straight from the file
+        return read_geometry(file_path, sheet_name).range_geometry(range_address)
+    except GeometryError:
+        # Formats the native reader does not handle fall back to Excel
+        with get_pool().book(file_path) as wb:
+            rng = wb.sheets[sheet_name].range(range_address)
+            return [c.column_width for c in rng.columns], [r.row_height for r in rng.rows]
+
+def split_range_into_pages(file_path: str, sheet_name: str, range_address: str, orientation: str = 'landscape',
+                           paper: str = 'A4', pages_wide: int = 1):
+    """
+    Splits the given Excel range into page-sized sub-ranges for printing.
+    The range geometry is indexed once per workbook revision, so changing the
+    layout only re-runs the page break search.
+    Returns a list of A1 address ranges for each page (down, then over).
+    """
+    def load_geometry():
+        col_widths, row_heights = get_range_geometry(file_path, sheet_name, range_address)
+        return [w * EXCEL_UNIT_TO_CM for w in col_widths], [h * POINTS_TO_CM for h in row_heights]
+
+    index = get_index(file_path, sheet_name, range_address, load_geometry)
+    _, page_list = index.paginate(paper, orientation, pages_wide=pages_wide)
+    top_row, left_col, _, _ = parse_range(range_address)
+    return page_addresses((top_row, left_col), page_list)
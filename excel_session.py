@@ -0,0 +1,193 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from instrumentation import span
+
+def init_com_thread():
+    """Initialise COM on a worker thread before it drives Excel (no-op off Windows)."""
+    try:
+        import pythoncom
+    except ImportError:
+        return
+    pythoncom.CoInitialize()
+
+class XlwingsBackend:
+    """Spreadsheet automation backend driving invisible Excel instances through xlwings."""
+
+    def start_app(self):
+        import xlwings as xw
+        app = xw.App(visible=False, add_book=False)
+        app.display_alerts = False
+        app.screen_updating = False
+        return app
+
+    def quit_app(self, app):
+        try:
+            app.quit()
+        except Exception:
+            app.kill()
+
+    def is_alive(self, app):
+        try:
+            app.books.count
+            return True
+        except Exception:
+            return False
+
+    def open_book(self, app, path):
+        # The pool never saves what it opens; read-only leaves the file free for the user to edit and save
+        return app.books.open(path, read_only=True, update_links=False)
+
+    def add_book(self, app):
+        return app.books.add()
+
+    def close_book(self, book):
+        book.close()
+
+class ExcelSession:
+    """A warm application instance and the workbooks it currently has open."""
+
+    def __init__(self, app):
+        self.app = app
+        self.books = {}  # (path, mtime) -> workbook handle
+        self.uses = 0
+        self.thread = threading.get_ident()  # COM objects only work on the thread that created them
+
+def book_key(path):
+    """Cache key for an open workbook: absolute path plus modification time."""
+    path = os.path.abspath(path)
+    return (os.path.normcase(path), os.path.getmtime(path))
+
+class ExcelSessionPool:
+    """
+    Keeps warm application instances and open workbook handles, leases them
+    to one operation at a time, and recycles an instance after max_uses
+    leases or as soon as an operation fails while holding it. At most
+    max_apps operations run at once; an idle instance is only handed back to
+    the thread that started it, so each worker thread drives its own Excel.
+    """
+
+    def __init__(self, backend=None, max_apps=1, max_uses=50):
+        self.backend = backend or XlwingsBackend()
+        self.max_apps = max_apps
+        self.max_uses = max_uses
+        self._idle = []
+        self._leased = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _acquire(self):
+        with self._cond:
+            while self._leased >= self.max_apps:
+                self._cond.wait()
+            self._leased += 1
+            session = next((s for s in reversed(self._idle) if s.thread == threading.get_ident()), None)
+            if session is not None:
+                self._idle.remove(session)
+        if session is not None and not self.backend.is_alive(session.app):
+            session = None
+        if session is None:
+            try:
+                with span("excel.start_app"):
+                    session = ExcelSession(self.backend.start_app())
+            except Exception:
+                self._release(None)
+                raise
+        session.uses += 1
+        return session
+
+    def _release(self, session, failed=False):
+        if session is not None and (failed or self._closed or session.uses >= self.max_uses):
+            self._shutdown(session)
+            session = None
+        with self._cond:
+            self._leased -= 1
+            if session is not None:
+                self._idle.append(session)
+            self._cond.notify()
+
+    def _shutdown(self, session):
+        for book in session.books.values():
+            try:
+                self.backend.close_book(book)
+            except Exception:
+                pass
+        session.books.clear()
+        with span("excel.quit_app"):
+            self.backend.quit_app(session.app)
+
+    @contextmanager
+    def app(self):
+        """Lease a warm application instance for the duration of the block."""
+        session = self._acquire()
+        try:
+            yield session.app
+        except BaseException:
+            self._release(session, failed=True)
+            raise
+        self._release(session)
+
+    @contextmanager
+    def book(self, path, keep_open=True):
+        """
+        Lease an open workbook for path. Handles are reused while the file's
+        mtime is unchanged; with keep_open=False the workbook is closed when
+        the block exits (use this for files that are about to be replaced).
+        """
+        key = book_key(path)
+        session = self._acquire()
+        try:
+            book = session.books.pop(key, None)
+            for stale in [k for k in session.books if k[0] == key[0]]:
+                self.backend.close_book(session.books.pop(stale))
+            if book is None:
+                with span("excel.open_book"):
+                    book = self.backend.open_book(session.app, path)
+            yield book
+            if keep_open:
+                session.books[key] = book
+            else:
+                self.backend.close_book(book)
+        except BaseException:
+            self._release(session, failed=True)
+            raise
+        self._release(session)
+
+    def forget(self, path):
+        """Close any cached handle for path, e.g. before the file is deleted or overwritten."""
+        norm = os.path.normcase(os.path.abspath(path))
+        with self._cond:
+            sessions = list(self._idle)
+        for session in sessions:
+            for key in [k for k in session.books if k[0] == norm]:
+                self.backend.close_book(session.books.pop(key))
+
+    def close_thread(self):
+        """
+        Quit the idle instances started by the calling thread. Worker threads
+        call this before they stop, as COM calls must come from that thread.
+        """
+        with self._cond:
+            sessions = [s for s in self._idle if s.thread == threading.get_ident()]
+            self._idle = [s for s in self._idle if s.thread != threading.get_ident()]
+        for session in sessions:
+            self._shutdown(session)
+
+    def close(self):
+        """Quit every idle instance; leased instances are quit when they are returned."""
+        with self._cond:
+            self._closed = True
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            self._shutdown(session)
+
+_pool = None
+
+def get_pool():
+    """Shared session pool for the running tool, closed automatically at exit."""
+    global _pool
+    if _pool is None:
+        _pool = ExcelSessionPool()
+        atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,230 @@
+"""
+Lightweight span instrumentation for the capture pipeline.
+
+Wrap a stage in `with span("excel.to_pdf"):` to record its wall time, CPU
+time (of the calling thread) and the growth of the process's peak RSS. Spans
+are off by default; span() then returns a shared no-op object, so leaving
+them in place costs one function call. Enable them with the --timings,
+--timings-log and --profile command line switches (see configure_from_argv).
+"""
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+_enabled = False
+_log = None
+_lock = threading.Lock()
+_totals = {}  # span name -> [count, wall, cpu, max peak RSS delta]
+_local = threading.local()
+_profile_path = None
+_profilers = []
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                "PagefileUsage", "PeakPagefileUsage")]
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (0 if unavailable)."""
+    if sys.platform == "win32":
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return 0
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+class Span:
+    """A timed stage; use as a context manager."""
+
+    __slots__ = ("name", "fields", "wall", "cpu", "rss")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self.name)
+        self.rss = peak_rss()
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        rss = peak_rss() - self.rss
+        stack = _local.stack
+        stack.pop()
+        record = {
+            "span": self.name,
+            "wall_ms": round(wall * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            "peak_rss_delta_kb": rss // 1024,
+            "parent": stack[-1] if stack else None,
+            "thread": threading.current_thread().name,
+            "ok": exc_type is None,
+            "time": time.time(),
+        }
+        record.update(self.fields)
+        with _lock:
+            totals = _totals.setdefault(self.name, [0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+            totals[3] = max(totals[3], rss)
+            if _log is not None:
+                _log.write(json.dumps(record, default=str) + "\n")
+                _log.flush()
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **fields):
+    """Context manager timing one pipeline stage; a shared no-op when disabled."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, fields)
+
+def event(name, **fields):
+    """Log a one-off measurement (e.g. time to first paint) when instrumentation is on."""
+    if not _enabled:
+        return
+    record = {"event": name, "thread": threading.current_thread().name, "time": time.time()}
+    record.update(fields)
+    with _lock:
+        if _log is not None:
+            _log.write(json.dumps(record, default=str) + "\n")
+            _log.flush()
+
+def enabled():
+    return _enabled
+
+def enable(log_path=None):
+    """Start recording spans, appending one JSON object per span to log_path if given."""
+    global _enabled, _log
+    with _lock:
+        if log_path and _log is None:
+            _log = open(log_path, "a", encoding="utf-8")
+        _enabled = True
+
+def disable():
+    global _enabled, _log
+    with _lock:
+        _enabled = False
+        if _log is not None:
+            _log.close()
+            _log = None
+
+def reset():
+    """Forget the accumulated per-stage totals."""
+    with _lock:
+        _totals.clear()
+
+def summary():
+    """Per-stage table of call counts, total and mean wall time, CPU time and peak RSS growth."""
+    with _lock:
+        rows = sorted(_totals.items(), key=lambda item: item[1][1], reverse=True)
+    if not rows:
+        return "No spans recorded."
+    width = max(len("stage"), max(len(name) for name, _ in rows))
+    lines = [f"{'stage':<{width}}  {'calls':>6}  {'wall ms':>10}  {'mean ms':>9}  {'cpu ms':>10}  {'peak RSS +MB':>12}"]
+    for name, (count, wall, cpu, rss) in rows:
+        lines.append(f"{name:<{width}}  {count:>6}  {wall * 1000:>10.1f}  {wall * 1000 / count:>9.1f}  "
+                     f"{cpu * 1000:>10.1f}  {rss / (1024 * 1024):>12.1f}")
+    return "\n".join(lines)
+
+class profiled:
+    """
+    Run the block under this thread's cProfile profiler when --profile is on.
+    Each thread gets its own profiler; all are merged into one file at exit.
+    """
+
+    __slots__ = ("profiler",)
+
+    def __enter__(self):
+        self.profiler = None
+        if _profile_path is None:
+            return self
+        profiler = getattr(_local, "profiler", None)
+        if profiler is None:
+            import cProfile
+            profiler = _local.profiler = cProfile.Profile()
+            with _lock:
+                _profilers.append(profiler)
+        self.profiler = profiler
+        profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            self.profiler.disable()
+        return False
+
+def _write_profile(limit=25):
+    import pstats
+    with _lock:
+        profilers = list(_profilers)
+    if not profilers:
+        return
+    stats = pstats.Stats(*profilers)
+    stats.dump_stats(_profile_path)
+    print(f"Profile written to {os.path.abspath(_profile_path)}")
+    stats.sort_stats("cumulative").print_stats(limit)
+
+def _report():
+    if _profile_path is not None:
+        _write_profile()
+    if _totals:
+        print(summary())
+    disable()
+
+def add_arguments(parser):
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--timings", action="store_true", help="Time pipeline stages and print a summary at exit")
+    group.add_argument("--timings-log", metavar="PATH", help="Also append every stage as a JSON line to PATH")
+    group.add_argument("--profile", metavar="PATH", help="Run jobs under cProfile and write the stats to PATH")
+
+def configure_from_argv(argv=None):
+    """
+    Enable instrumentation from --timings / --timings-log / --profile in argv
+    and return the remaining arguments. The summary table (and profile) are
+    printed when the process exits.
+    """
+    global _profile_path
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_arguments(parser)
+    args, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    if args.timings or args.timings_log or args.profile:
+        enable(args.timings_log)
+        _profile_path = args.profile
+        atexit.register(_report)
+    return rest
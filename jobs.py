@@ -0,0 +1,160 @@
+"""
+Background job executor for the Tk tools.
+
+Work runs on worker threads; progress, results and errors are passed back
+through a thread-safe queue that the GUI drains with root.after, so all
+callbacks run on the Tk main thread.
+"""
+import queue
+import threading
+from instrumentation import profiled, span
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+_current = threading.local()
+
+def current_job():
+    """The job running on this thread, or None outside a job."""
+    return getattr(_current, "job", None)
+
+def stage(name):
+    """
+    Report that the running job entered a new stage and stop here if it was
+    cancelled. A no-op when called outside a job, so pipeline code can call it
+    unconditionally.
+    """
+    job = current_job()
+    if job is not None:
+        job.stage(name)
+
+class Job:
+    """A unit of work submitted to a JobExecutor."""
+
+    def __init__(self, executor, name, fn, args, on_done, on_error, on_progress, background=False):
+        self.executor = executor
+        self.name = name
+        self.background = background
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def stage(self, name):
+        self.check()
+        if self.on_progress is not None:
+            self.executor.events.put((self.on_progress, (self, name)))
+
+class JobExecutor:
+    """
+    Runs submitted jobs on worker threads in submission order. initializer
+    runs once on each worker thread (e.g. to initialise COM for Excel), and
+    finalizer once on each as it stops after shutdown() (e.g. to quit the
+    Excel instances that thread started).
+    """
+
+    def __init__(self, workers=1, initializer=None, name="jobs", finalizer=None):
+        self.events = queue.Queue()
+        self._jobs = queue.Queue()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._initializer = initializer
+        self._finalizer = finalizer
+        self._threads = [threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args, name="", on_done=None, on_error=None, on_progress=None, background=False):
+        """
+        Queue fn(*args); callbacks receive (job, result/exception/stage) on the
+        polling thread. Background jobs (e.g. prefetching) are left out of pending().
+        """
+        job = Job(self, name, fn, args, on_done, on_error, on_progress, background)
+        with self._lock:
+            self._pending.append(job)
+        self._jobs.put(job)
+        return job
+
+    def pending(self, background=False):
+        """Jobs queued or running that have not been cancelled."""
+        with self._lock:
+            return [job for job in self._pending
+                    if not job.cancelled and (background or not job.background)]
+
+    def cancel_all(self):
+        for job in self.pending(background=True):
+            job.cancel()
+
+    def _worker(self):
+        if self._initializer is not None:
+            self._initializer()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                if self._finalizer is not None:
+                    self._finalizer()
+                return
+            _current.job = job
+            event = None
+            try:
+                job.check()
+                with span("job." + job.fn.__name__, job=job.name), profiled():
+                    result = job.fn(*job.args)
+                job.check()
+                if job.on_done is not None:
+                    event = (job.on_done, (job, result))
+            except JobCancelled:
+                pass
+            except Exception as e:
+                if job.on_error is not None:
+                    event = (job.on_error, (job, e))
+            finally:
+                _current.job = None
+                with self._lock:
+                    self._pending.remove(job)
+            # Posted after the job leaves the pending list, so callbacks see an up-to-date queue
+            if event is not None:
+                self.events.put(event)
+
+    def poll(self):
+        """Run queued callbacks on the calling thread."""
+        while True:
+            try:
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+
+    def attach(self, root, interval_ms=50):
+        """
+        Drain callbacks on the Tk main loop every interval_ms. A callback that
+        raises is reported by Tk and does not stop the polling.
+        """
+        def tick():
+            try:
+                self.poll()
+            finally:
+                root.after(interval_ms, tick)
+        root.after(interval_ms, tick)
+
+    def shutdown(self, wait=True):
+        """Stop the workers once every queued job has run."""
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -1,12 +1,19 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import fitz  # PyMuPDF
-from PIL import Image
-import win32clipboard
-import io
+from clipboard import copy_dib_to_clipboard, copy_vector_to_clipboard, pixmap_to_dib, set_file_drop
+from render_cache import get_cache, make_key
+from jobs import JobExecutor, stage
+from prefetch import Prefetcher, neighbours
+import instrumentation
+import render_engine
+import startup
+import multiprocessing
 import os
 import sys
 
+# Largest size of the preview thumbnail shown in the window
+PREVIEW_SIZE = (240, 240)
+
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and PyInstaller"""
     try:
@@ -15,6 +22,53 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+def page_render(pdf_file, page_num, dpi, mode="color"):
+    """Cache key and render function producing the CF_DIB payload for one page in a render mode."""
+    def render():
+        stage("Rendering")
+        # CF_DIB straight from the render, in strips for oversized pages
+        return render_engine.render_page_dib(pdf_file, page_num, dpi, mode=mode)
+
+    return make_key(pdf_file, page_num, dpi, colorspace=mode), render
+
+def copy_page_to_clipboard(pdf_file, page_num, dpi, mode="color"):
+    """Render a page (or reuse an earlier or prefetched render of the same content) and copy it to the clipboard."""
+    key, render = page_render(pdf_file, page_num, dpi, mode)
+    # The disk copy of a new render is written after the clipboard is updated
+    with get_cache().rendered(key, lambda: prefetcher.take(key) or render()) as data:
+        stage("Copying to clipboard")
+        return copy_dib_to_clipboard(data)
+
+def copy_preview_to_clipboard(pdf_file, page_num, dpi, mode="color"):
+    """
+    Copy a quick low-DPI render of the page to the clipboard and return a
+    PPM thumbnail for the preview pane. Returns None without copying when the
+    full-quality render is already cached or prefetched. Black & white
+    previews stay grayscale, as thresholding at low DPI breaks up text.
+    """
+    key, _ = page_render(pdf_file, page_num, dpi, mode)
+    if key in get_cache() or key in prefetcher.buffer:
+        return None
+    stage("Rendering preview")
+    pix = render_engine.render_page(pdf_file, page_num, render_engine.PREVIEW_DPI, gray=mode != "color")
+    copy_dib_to_clipboard(pixmap_to_dib(pix))
+    return render_engine.thumbnail(pix, *PREVIEW_SIZE).tobytes("ppm")
+
+def copy_vector_page_to_clipboard(pdf_file, page_num):
+    """Copy a page as SVG and a one-page PDF, with a screen-resolution bitmap for image-only applications."""
+    stage("Exporting vectors")
+    svg, pdf, fallback_dib = render_engine.render_page_vector(pdf_file, page_num)
+    stage("Copying to clipboard")
+    return copy_vector_to_clipboard(svg, pdf, fallback_dib)
+
+def prefetch_neighbours(pdf_file, page_num, dpi, mode="color"):
+    """Render the pages either side of page_num in the background at the same DPI and render mode."""
+    def renders():
+        # Runs on the worker: page_count() waits for the document and make_key() hashes the file
+        return [(f"Prefetch page {n}",) + page_render(pdf_file, n, dpi, mode)
+                for n in neighbours(page_num, render_engine.page_count(pdf_file))]
+    prefetcher.schedule_later((pdf_file, dpi, mode), renders)
+
 def convert_and_copy():
     pdf_file = pdf_path.get()
     page_num = page_entry.get()
@@ -28,49 +82,81 @@ def convert_and_copy():
         messagebox.showerror("Error", "Please enter a positive integer for the page number.")
         return
 
-    # Map quality to DPI
-    quality_map = {
-        "Low Quality": 100,
-        "Medium Quality": 300,
-        "High Quality": 600
-    }
-    dpi = quality_map[quality]
+    if quality == render_engine.VECTOR_QUALITY:
+        # Vector output is small and quick, so there is no preview or prefetch
+        prefetcher.cancel()
+        job_executor.submit(copy_vector_page_to_clipboard, pdf_file, int(page_num), name=f"Page {page_num}",
+                            on_done=on_vector_done, on_error=on_job_error, on_progress=on_job_progress)
+        update_queue_status()
+        return
 
-    try:
-        status_var.set("Processing...")
-        root.update_idletasks()
-
-        # Open PDF and render page
-        doc = fitz.open(pdf_file)
-        if int(page_num) > doc.page_count:
-            doc.close()
-            raise ValueError(f"Page {page_num} does not exist. PDF has {doc.page_count} pages.")
-
-        page = doc.load_page(int(page_num) - 1)  # 0-based index
-        zoom = dpi / 72  # PyMuPDF default resolution is 72 DPI
-        mat = fitz.Matrix(zoom, zoom)  # Scale matrix for DPI
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        img_data = pix.tobytes("png")  # Get image as PNG
-
-        # Convert to PIL Image for clipboard
-        image = Image.open(io.BytesIO(img_data))
-
-        # Save image to bytes buffer for clipboard (BMP format)
-        with io.BytesIO() as output:
-            image.save(output, format="BMP")
-            data = output.getvalue()[14:]  # Skip BMP header
-
-        # Copy to clipboard
-        win32clipboard.OpenClipboard()
-        win32clipboard.EmptyClipboard()
-        win32clipboard.SetClipboardData(win32clipboard.CF_DIB, data)
-        win32clipboard.CloseClipboard()
-
-        doc.close()
-        status_var.set("Image copied to clipboard!")
-    except Exception as e:
-        messagebox.showerror("Error", f"An error occurred: {str(e)}")
-        status_var.set("Ready")
+    dpi = render_engine.QUALITY_TO_DPI[quality]
+    mode = render_engine.RENDER_MODE_LABELS[mode_var.get()]
+
+    # Render in the background so the window stays responsive; clicks queue up.
+    # Outstanding prefetches are dropped so they do not delay the capture.
+    prefetcher.cancel()
+    if progressive_var.get():
+        # A low-DPI copy lands on the clipboard first; the full render replaces it
+        job_executor.submit(copy_preview_to_clipboard, pdf_file, int(page_num), dpi, mode, name=f"Page {page_num}",
+                            on_done=on_preview_done, on_error=on_job_error, on_progress=on_job_progress)
+    job_executor.submit(copy_page_to_clipboard, pdf_file, int(page_num), dpi, mode, name=f"Page {page_num}",
+                        on_done=on_job_done, on_error=on_job_error, on_progress=on_job_progress)
+    update_queue_status()
+
+def update_queue_status(current=None):
+    """Show the running job's stage and how many captures are waiting."""
+    pending = job_executor.pending()
+    if not pending:
+        return
+    text = current or f"{pending[0].name}: Processing..."
+    # A progressive capture is a preview job plus a full job under one name
+    queued = len({job.name for job in pending}) - 1
+    if queued:
+        text += f" ({queued} queued)"
+    status_var.set(text)
+
+def on_job_progress(job, stage_name):
+    update_queue_status(f"{job.name}: {stage_name}...")
+
+def show_preview(ppm):
+    """Show a PPM thumbnail in the preview pane."""
+    image = tk.PhotoImage(data=ppm)
+    preview_label.configure(image=image, text="")
+    preview_label.image = image  # Keep a reference so Tk does not drop it
+
+def on_preview_done(job, ppm):
+    if ppm is None:
+        return
+    show_preview(ppm)
+    message = f"{job.name}: preview copied, rendering full quality..."
+    status_var.set(message)
+    update_queue_status(message)
+
+def on_job_done(job, stats):
+    status_var.set(f"{job.name} copied to clipboard ({stats})")
+    update_queue_status()
+    if prefetch_var.get():
+        prefetch_neighbours(*job.args)
+
+def on_vector_done(job, stats):
+    status_var.set(f"{job.name} copied to clipboard as vectors ({stats})")
+    update_queue_status()
+
+def on_prefetch_toggle():
+    prefetcher.enabled = prefetch_var.get()
+    if not prefetcher.enabled:
+        prefetcher.reset()
+
+def on_job_error(job, e):
+    messagebox.showerror("Error", f"An error occurred: {str(e)}")
+    status_var.set("Ready")
+    update_queue_status()
+
+def cancel_jobs():
+    """Cancel the running capture and any queued ones."""
+    job_executor.cancel_all()
+    status_var.set("Cancelled")
 
 def browse_pdf():
     file_path = filedialog.askopenfilename(filetypes=[("PDF files", "*.pdf")])
@@ -82,49 +168,103 @@ def show_help():
                         "1. Click 'Browse' to select a PDF file.\n"
                         "2. Enter the page number you want to capture.\n"
                         "3. Choose a quality level from the dropdown.\n"
-                        "4. Click 'Convert and Copy' to copy the image to your clipboard.\n\n"
+                        "4. Click 'Convert and Copy' to copy the image to your clipboard.\n"
+                        "   Captures run in the background; click again to queue more pages, or 'Cancel' to stop.\n"
+                        "   With 'Prefetch' ticked, the pages either side are rendered ahead of time.\n"
+                        "   The image is copied as a bitmap and a compressed PNG; with 'Copy as file'\n"
+                        "   ticked it can also be pasted as a PNG file, e.g. as an attachment.\n"
+                        "   With 'Preview first' ticked, a quick low-resolution copy is shown and put on the\n"
+                        "   clipboard straight away, then replaced by the full-quality image.\n\n"
                         "Quality Levels:\n"
                         "- Low Quality: 100 DPI (smaller, less detailed)\n"
                         "- Medium Quality: 300 DPI (balanced)\n"
-                        "- High Quality: 600 DPI (larger, more detailed)")
+                        "- High Quality: 600 DPI (larger, more detailed)\n"
+                        "- Fit 8 MP / Fit 4000 px / Fit 8 MB: the highest DPI at which each page stays\n"
+                        "  under 8 megapixels, 4000 pixels along its long edge, or an 8 MB image\n"
+                        "- Vector (SVG): sharp at any zoom and far smaller; pastes as SVG where supported,\n"
+                        "  otherwise as a screen-resolution image\n\n"
+                        "Render Modes:\n"
+                        "- Grayscale: a third of the size of Color\n"
+                        "- Black & White: pure black or white pixels, 24x smaller; best for line drawings")
 
 def close_window():
+    job_executor.cancel_all()
     root.destroy()  # Gracefully close the GUI
 
-# Set up GUI
-root = tk.Tk()
-root.title("PDF Page to Clipboard")
-root.geometry("500x250")
-root.resizable(False, False)
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Worker processes in the PyInstaller build
+
+    # --timings / --timings-log PATH / --profile PATH, for either mode
+    argv = instrumentation.configure_from_argv()
+
+    # Headless batch rendering: python main.py render file.pdf --pages 1-200 --dpi 300 --out dir/
+    if argv and argv[0] == "render":
+        with instrumentation.profiled():
+            status = render_engine.main(argv[1:])
+        sys.exit(status)
+
+    # Background worker for rendering and clipboard jobs
+    job_executor = JobExecutor()
+    prefetcher = Prefetcher(job_executor)
+
+    # Set up GUI
+    root = tk.Tk()
+    root.title("PDF Page to Clipboard")
+    root.geometry("760x280")
+    root.resizable(False, False)
+
+    # Handle window close event
+    root.protocol("WM_DELETE_WINDOW", close_window)
+
+    # PDF selection
+    pdf_path = tk.StringVar()
+    tk.Label(root, text="PDF File:").grid(row=0, column=0, padx=10, pady=10, sticky="e")
+    tk.Entry(root, textvariable=pdf_path, width=40, state="readonly").grid(row=0, column=1, columnspan=2, padx=5, pady=10)
+    tk.Button(root, text="Browse", command=browse_pdf).grid(row=0, column=3, padx=5, pady=10)
 
-# Handle window close event
-root.protocol("WM_DELETE_WINDOW", close_window)
+    # Page number
+    tk.Label(root, text="Page Number:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
+    page_entry = tk.Entry(root, width=10)
+    page_entry.grid(row=1, column=1, padx=5, pady=10, sticky="w")
+    prefetch_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(root, text="Prefetch", variable=prefetch_var, command=on_prefetch_toggle).grid(row=1, column=2, padx=5, pady=10, sticky="w")
+    file_drop_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(root, text="Copy as file", variable=file_drop_var,
+                   command=lambda: set_file_drop(file_drop_var.get())).grid(row=1, column=3, padx=5, pady=10, sticky="w")
 
-# PDF selection
-pdf_path = tk.StringVar()
-tk.Label(root, text="PDF File:").grid(row=0, column=0, padx=10, pady=10, sticky="e")
-tk.Entry(root, textvariable=pdf_path, width=40, state="readonly").grid(row=0, column=1, columnspan=2, padx=5, pady=10)
-tk.Button(root, text="Browse", command=browse_pdf).grid(row=0, column=3, padx=5, pady=10)
+    # Quality dropdown
+    tk.Label(root, text="Quality:").grid(row=2, column=0, padx=10, pady=10, sticky="e")
+    quality_var = tk.StringVar(value="Medium Quality")
+    quality_dropdown = ttk.Combobox(root, textvariable=quality_var, values=list(render_engine.QUALITY_TO_DPI) + [render_engine.VECTOR_QUALITY], state="readonly")
+    quality_dropdown.grid(row=2, column=1, padx=5, pady=10, sticky="w")
+    progressive_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(root, text="Preview first", variable=progressive_var).grid(row=2, column=2, padx=5, pady=10, sticky="w")
+    mode_var = tk.StringVar(value="Color")
+    ttk.Combobox(root, textvariable=mode_var, values=list(render_engine.RENDER_MODE_LABELS), state="readonly", width=13).grid(row=2, column=3, padx=5, pady=10, sticky="w")
 
-# Page number
-tk.Label(root, text="Page Number:").grid(row=1, column=0, padx=10, pady=10, sticky="e")
-page_entry = tk.Entry(root, width=10)
-page_entry.grid(row=1, column=1, padx=5, pady=10, sticky="w")
+    # Convert and cancel buttons
+    tk.Button(root, text="Convert and Copy", command=convert_and_copy).grid(row=3, column=1, columnspan=2, pady=10)
+    tk.Button(root, text="Cancel", command=cancel_jobs).grid(row=3, column=3, padx=5, pady=10)
 
-# Quality dropdown
-tk.Label(root, text="Quality:").grid(row=2, column=0, padx=10, pady=10, sticky="e")
-quality_var = tk.StringVar(value="Medium Quality")
-quality_dropdown = ttk.Combobox(root, textvariable=quality_var, values=["Low Quality", "Medium Quality", "High Quality"], state="readonly")
-quality_dropdown.grid(row=2, column=1, padx=5, pady=10, sticky="w")
+    # Status label
+    status_var = tk.StringVar(value="Ready")
+    tk.Label(root, textvariable=status_var).grid(row=4, column=0, columnspan=4, pady=10)
 
-# Convert button
-tk.Button(root, text="Convert and Copy", command=convert_and_copy).grid(row=3, column=1, columnspan=2, pady=10)
+    # Help button
+    tk.Button(root, text="Help", command=show_help).grid(row=5, column=1, columnspan=2, pady=10)
 
-# Status label
-status_var = tk.StringVar(value="Ready")
-tk.Label(root, textvariable=status_var).grid(row=4, column=0, columnspan=4, pady=10)
+    # Preview pane
+    preview_frame = tk.Frame(root, width=PREVIEW_SIZE[0], height=PREVIEW_SIZE[1], relief="sunken", borderwidth=1)
+    preview_frame.grid(row=0, column=4, rowspan=6, padx=10, pady=10)
+    preview_frame.grid_propagate(False)
+    preview_label = tk.Label(preview_frame, text="No preview")
+    preview_label.place(relx=0.5, rely=0.5, anchor="center")
 
-# Help button
-tk.Button(root, text="Help", command=show_help).grid(row=5, column=1, columnspan=2, pady=10)
+    # Prefetched pages are only valid for the current file and quality
+    pdf_path.trace_add("write", lambda *_: prefetcher.reset())
+    quality_var.trace_add("write", lambda *_: prefetcher.reset())
+    mode_var.trace_add("write", lambda *_: prefetcher.reset())
 
-root.mainloop()
\ No newline at end of file
+    job_executor.attach(root)
+    startup.on_first_paint(root)  # PyMuPDF is imported once the window is up
+    root.mainloop()
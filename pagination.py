@@ -0,0 +1,148 @@
+"""
+Prefix-sum pagination of a cell range.
+
+A PaginationIndex is built once per (workbook revision, sheet, range) from the
+range's column widths and row heights. Page breaks for any paper size,
+orientation, margin or fit setting are then found with bisect over cumulative
+sums, without touching the workbook again.
+"""
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from instrumentation import span
+
+from sheet_geometry import format_range
+
+# Paper sizes in cm (portrait)
+PAPER_SIZES = {
+    "A4": (21.0, 29.7),
+    "A3": (29.7, 42.0),
+    "Letter": (21.59, 27.94),
+    "Legal": (21.59, 35.56),
+}
+
+# Excel XlPaperSize constants for PageSetup.PaperSize
+XL_PAPER_SIZES = {
+    "A4": 9,
+    "A3": 8,
+    "Letter": 1,
+    "Legal": 5,
+}
+
+_EPSILON = 1e-9
+
+def page_dimensions(paper="A4", orientation="landscape", margins_cm=0.0):
+    """
+    Printable (width, height) in cm. paper is a PAPER_SIZES name or a custom
+    (width_cm, height_cm) tuple; margins_cm is removed from every edge.
+    """
+    width, height = PAPER_SIZES[paper] if isinstance(paper, str) else paper
+    if (orientation == "landscape") != (width > height):
+        width, height = height, width
+    width -= 2 * margins_cm
+    height -= 2 * margins_cm
+    if width <= 0 or height <= 0:
+        raise ValueError("Margins leave no printable area on the page.")
+    return width, height
+
+def _partition(cum, limit):
+    """Greedy partition of items (given as prefix sums) into runs no longer than limit."""
+    parts = []
+    n = len(cum) - 1
+    start = 0
+    while start < n:
+        end = bisect_right(cum, cum[start] + limit + _EPSILON, start + 1) - 1
+        if end == start:  # A single item larger than a page still gets its own page
+            end += 1
+        parts.append((start, end - 1))
+        start = end
+    return parts
+
+class PaginationIndex:
+    """Cumulative row-height and column-width arrays for one cell range."""
+
+    def __init__(self, col_widths_cm, row_heights_cm):
+        self.col_cum = array("d", accumulate(col_widths_cm, initial=0.0))
+        self.row_cum = array("d", accumulate(row_heights_cm, initial=0.0))
+
+    @property
+    def total_width(self):
+        return self.col_cum[-1]
+
+    @property
+    def total_height(self):
+        return self.row_cum[-1]
+
+    def fit_columns(self, page_w, pages_wide=1):
+        """
+        Find the largest scale at which the columns split into at most
+        pages_wide page-width strips. Returns (scale, column parts).
+        """
+        n_cols = len(self.col_cum) - 1
+        if pages_wide <= 1 or n_cols <= 1:
+            return page_w / self.total_width, [(0, n_cols - 1)]
+        # Binary search the narrowest strip width whose greedy split still fits;
+        # no strip can be narrower than the widest column
+        widest = max(b - a for a, b in zip(self.col_cum, self.col_cum[1:]))
+        lo, hi = max(self.total_width / pages_wide, widest), self.total_width
+        if len(_partition(self.col_cum, lo)) <= pages_wide:
+            hi = lo
+        for _ in range(50):
+            if hi - lo <= _EPSILON * max(1.0, hi):
+                break
+            mid = (lo + hi) / 2
+            if len(_partition(self.col_cum, mid)) <= pages_wide:
+                hi = mid
+            else:
+                lo = mid
+        return page_w / hi, _partition(self.col_cum, hi)
+
+    def paginate(self, paper="A4", orientation="landscape", margins_cm=0.0, pages_wide=1, scale=None):
+        """
+        Split the range into pages. By default the range is scaled to fit
+        pages_wide pages across; pass scale to print at a fixed zoom instead,
+        in which case columns are split wherever they overflow a page.
+
+        Returns (scale, pages) where each page is (first_row, last_row,
+        first_col, last_col) as 0-based offsets into the range, ordered
+        down then over like Excel.
+        """
+        if self.total_width <= 0 or self.total_height <= 0:
+            raise ValueError("The selected range has no visible rows or columns.")
+        page_w, page_h = page_dimensions(paper, orientation, margins_cm)
+        if scale is None:
+            scale, col_parts = self.fit_columns(page_w, pages_wide)
+        else:
+            col_parts = _partition(self.col_cum, page_w / scale)
+        row_parts = _partition(self.row_cum, page_h / scale)
+        pages = [(r0, r1, c0, c1) for (c0, c1) in col_parts for (r0, r1) in row_parts]
+        return scale, pages
+
+def page_addresses(range_top_left, pages):
+    """Convert paginate() offsets into absolute A1 addresses."""
+    top_row, left_col = range_top_left
+    return [format_range(top_row + r0, left_col + c0, top_row + r1, left_col + c1)
+            for (r0, r1, c0, c1) in pages]
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def get_index(file_path, sheet_name, range_address, load_geometry):
+    """
+    Return the PaginationIndex for (workbook revision, sheet, range), building
+    it with load_geometry() -> (col_widths_cm, row_heights_cm) on first use.
+    """
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path), sheet_name, range_address.upper())
+    with _index_lock:
+        index = _index_cache.get(key)
+    if index is None:
+        with span("layout.build_index"):
+            index = PaginationIndex(*load_geometry())
+        with _index_lock:
+            # Drop indexes for older revisions of the same workbook
+            for stale in [k for k in _index_cache if k[0] == key[0] and k[1] != key[1]]:
+                del _index_cache[stale]
+            _index_cache[key] = index
+    return index
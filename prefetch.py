@@ -0,0 +1,100 @@
+"""
+Speculative rendering of the pages next to the one just captured.
+
+Users mostly step through pages in order, so after page N is served the
+neighbouring pages are rendered in the background into a bounded in-memory
+buffer. A capture that finds its page there only pays for the clipboard write.
+"""
+import threading
+from render_cache import MemoryLRU
+
+DEFAULT_PREFETCH_BYTES = 256 * 1024 * 1024
+
+def neighbours(page_num, page_count, radius=1):
+    """Pages around page_num to prefetch, most likely next first: N+1, N-1, N+2, ..."""
+    pages = []
+    for step in range(1, radius + 1):
+        for candidate in (page_num + step, page_num - step):
+            if 1 <= candidate <= page_count:
+                pages.append(candidate)
+    return pages
+
+class Prefetcher:
+    """
+    Runs prefetch renders as background jobs on a JobExecutor and keeps their
+    payloads in a MemoryLRU of at most max_bytes. Everything buffered belongs
+    to one context (e.g. file, sheet and DPI); scheduling under a different
+    context, or calling reset(), cancels outstanding renders and drops the buffer.
+    """
+
+    def __init__(self, executor, max_bytes=DEFAULT_PREFETCH_BYTES):
+        self.executor = executor
+        self.buffer = MemoryLRU(max_bytes)
+        self.enabled = True
+        self.hits = 0
+        self._context = None
+        self._jobs = []
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Remove and return a prefetched payload, or None if it was not prefetched."""
+        data = self.buffer.pop(key)
+        if data is not None:
+            self.hits += 1
+        return data
+
+    def cancel(self):
+        """Cancel queued and running prefetch renders, keeping what is already buffered."""
+        with self._lock:
+            jobs, self._jobs = self._jobs, []
+        for job in jobs:
+            job.cancel()
+
+    def reset(self):
+        """Cancel everything and drop the buffer, e.g. when the file, sheet or DPI changes."""
+        self.cancel()
+        with self._lock:
+            self._context = None
+        self.buffer.clear()
+
+    def schedule(self, context, renders):
+        """
+        Queue background renders for context. renders is an iterable of
+        (name, key, render) where render() returns the payload bytes; keys
+        already buffered are skipped.
+        """
+        if not self.enabled:
+            return
+        if context != self._context:
+            self.reset()
+        with self._lock:
+            self._context = context
+        for name, key, render in renders:
+            if key in self.buffer:
+                continue
+            job = self.executor.submit(self._run, context, key, render, name=name, background=True)
+            with self._lock:
+                self._jobs.append(job)
+
+    def schedule_later(self, context, list_renders, name="Prefetch"):
+        """
+        Like schedule(), but list_renders() is called on a worker thread to
+        produce the renders, as listing them may open or hash the source file
+        and must not block the GUI thread. Cancelled along with the renders.
+        """
+        if not self.enabled:
+            return
+        job = self.executor.submit(self._schedule, context, list_renders, name=name, background=True)
+        with self._lock:
+            self._jobs.append(job)
+
+    def _schedule(self, context, list_renders):
+        self.schedule(context, list_renders())
+
+    def _run(self, context, key, render):
+        if key in self.buffer:
+            return
+        data = render()
+        # A render that finishes after a context change is stale; discard it
+        if context == self._context:
+            self.buffer.put(key, data)
@@ -0,0 +1,224 @@
+"""
+Two-tier, content-addressed cache for rendered clipboard payloads.
+
+Keys combine a hash of the source file's content with everything that affects
+the rendered output (page or range, DPI, crop, colorspace). Tier one is an
+in-memory LRU bounded by bytes; tier two is an on-disk store with a size cap.
+Payloads are kept as the renderer returned them (bytes or bytearray), without
+copying, so they must not be modified once cached.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from instrumentation import span
+
+DEFAULT_MEMORY_BYTES = 256 * 1024 * 1024
+DEFAULT_DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+_digests = {}
+_digest_lock = threading.Lock()
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's content, memoized by (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        digest = _digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f, span("cache.hash_source", bytes=st.st_size):
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _digest_lock:
+            _digests[memo_key] = digest
+    return digest
+
+def make_key(source_path, page, dpi, crop=None, colorspace="rgb"):
+    """Cache key for one rendered page (or range) of a source file."""
+    parts = (file_digest(source_path), page, dpi, crop, colorspace)
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+class MemoryLRU:
+    """Least-recently-used mapping of key -> payload, bounded by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = data
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def pop(self, key):
+        with self._lock:
+            data = self._items.pop(key, None)
+            if data is not None:
+                self.bytes -= len(data)
+            return data
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+class DiskStore:
+    """Files named by key in a directory, evicted oldest-access-first beyond max_bytes."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.bytes = sum(entry.stat().st_size for entry in os.scandir(directory)
+                         if entry.is_file() and entry.name.endswith(".bin"))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return False
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        with self._lock:
+            if os.path.exists(path):
+                self.bytes -= os.path.getsize(path)
+            os.replace(tmp, path)
+            self.bytes += len(data)
+            if self.bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def _evict(self):
+        entries = sorted((e for e in os.scandir(self.directory) if e.is_file() and e.name.endswith(".bin")),
+                         key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            if self.bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.bytes -= size
+            self.evictions += 1
+
+class RenderCache:
+    """Memory LRU in front of a size-capped disk store, with hit/miss statistics."""
+
+    def __init__(self, memory_bytes=DEFAULT_MEMORY_BYTES, disk_dir=None, disk_bytes=DEFAULT_DISK_BYTES):
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskStore(disk_dir, disk_bytes) if disk_dir else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.memory or (self.disk is not None and key in self.disk)
+
+    def get(self, key):
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                self.disk_hits += 1
+                self.memory.put(key, data)
+                return data
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        self.memory.put(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    @contextmanager
+    def rendered(self, key, render):
+        """
+        Yield the cached payload for key, calling render() to produce it on a
+        miss. A new payload goes into the memory tier at once and is written
+        to the disk tier from the same buffer after the with block, so e.g. a
+        clipboard publish inside the block does not wait for the disk write.
+        """
+        with span("cache.get"):
+            data = self.get(key)
+        if data is not None:
+            yield data
+            return
+        data = render()
+        self.memory.put(key, data)
+        yield data
+        if self.disk is not None:
+            with span("cache.put", bytes=len(data)):
+                self.disk.put(key, data)
+
+    def stats(self):
+        return {
+            "hits": self.memory_hits + self.disk_hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_bytes": self.memory.bytes,
+            "memory_items": len(self.memory),
+            "disk_bytes": self.disk.bytes if self.disk else 0,
+            "evictions": self.memory.evictions + (self.disk.evictions if self.disk else 0),
+        }
+
+_cache = None
+
+def get_cache():
+    """Shared render cache, with its disk tier under the system temp directory."""
+    global _cache
+    if _cache is None:
+        _cache = RenderCache(disk_dir=os.path.join(tempfile.gettempdir(), "pdf_to_clipboard_cache"))
+    return _cache
@@ -0,0 +1,416 @@
+import argparse
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import tiled
+from admission import admit, get_scheduler, set_scheduler, shared_scheduler
+from document_cache import get_documents
+from instrumentation import span
+
+# Resolution of the quick first render in progressive mode
+PREVIEW_DPI = 72
+
+# Render modes and the CF_DIB depth each produces; gray and black-and-white
+# pages are rasterized as grayscale, a third of the memory of RGB
+RENDER_MODES = {"color": 24, "gray": 8, "bw": 1}
+# Render mode choices in the GUIs; grayscale and black & white bitmaps are 3x and 24x smaller than color
+RENDER_MODE_LABELS = {"Color": "color", "Grayscale": "gray", "Black & White": "bw"}
+
+# Output targets: instead of a fixed DPI, a page can be rendered at the highest
+# DPI (within TARGET_DPI_RANGE) at which it stays under a cap on megapixels,
+# long edge in pixels or CF_DIB payload megabytes, written ("mp", 8) or "8mp"
+TARGET_KINDS = ("mp", "px", "mb")
+TARGET_DPI_RANGE = (36, 1200)
+
+# Quality settings in the GUIs: a fixed DPI or an output target
+QUALITY_TO_DPI = {
+    "Low Quality": 100,
+    "Medium Quality": 300,
+    "High Quality": 600,
+    # Output targets: the DPI is worked out per page from its size
+    "Fit 8 MP": ("mp", 8),
+    "Fit 4000 px": ("px", 4000),
+    "Fit 8 MB": ("mb", 8),
+}
+
+# Output formats that keep the page as vector graphics instead of rasterizing it
+VECTOR_FORMATS = ("svg", "pdf")
+# Resolution of the bitmap published next to a vector capture for bitmap-only applications
+VECTOR_FALLBACK_DPI = 96
+# Quality setting in the GUIs that copies the page as vector graphics instead of a bitmap
+VECTOR_QUALITY = "Vector (SVG)"
+
+# PyMuPDF shares one MuPDF context between threads and is not thread-safe, so
+# code that may touch it from several threads at once (e.g. batch workers)
+# holds this lock around its PyMuPDF calls
+MUPDF_LOCK = threading.RLock()
+
+def crop_rect(page_rect, crop, dpi=None):
+    """
+    Resolve a crop spec to a clip rectangle in page coordinates (points).
+    crop may be None (whole page), a ratio in (0, 1] keeping that top fraction
+    of the page, or an (x0, y0, x1, y1) rectangle in page points. Given the
+    render dpi, a ratio keeps exactly int(rendered height * ratio) rows (at
+    least one), as cropping a full render did.
+    """
+    import fitz  # PyMuPDF
+    if crop is None:
+        return None
+    page_rect = fitz.Rect(page_rect)
+    if isinstance(crop, (int, float)):
+        if not 0 < crop <= 1:
+            raise ValueError("Crop ratio must be between 0 and 1.")
+        if crop == 1:
+            return None
+        if dpi is None:
+            return fitz.Rect(page_rect.x0, page_rect.y0, page_rect.x1, page_rect.y0 + page_rect.height * crop)
+        zoom = dpi / 72
+        rows = max(1, int((page_rect * fitz.Matrix(zoom, zoom)).round().height * crop))
+        return fitz.Rect(page_rect.x0, page_rect.y0, page_rect.x1, page_rect.y0 + rows / zoom)
+    clip = fitz.Rect(crop) & page_rect
+    if clip.is_empty:
+        raise ValueError("Crop rectangle does not overlap the page.")
+    return clip
+
+def content_bbox(page, probe_dpi=36, tolerance=16, margin=2.0):
+    """
+    Find the bounding box of non-background content on a page, in page points.
+    A grayscale probe is rendered at low DPI and scanned with NumPy row and
+    column reductions; the background is taken from the probe's corners.
+    Returns None for a blank page.
+    """
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    zoom = probe_dpi / 72
+    with span("render.auto_trim_probe"):
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    corners = gray[[0, 0, -1, -1], [0, -1, 0, -1]]
+    background = int(np.median(corners))
+    ink = np.abs(gray.astype(np.int16) - background) > tolerance
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0:
+        return None
+    # Pixel edges back to points, widened by one probe pixel plus the margin
+    slack = 1 / zoom + margin
+    origin = page.rect.tl
+    bbox = fitz.Rect(cols[0] / zoom - slack, rows[0] / zoom - slack,
+                     (cols[-1] + 1) / zoom + slack, (rows[-1] + 1) / zoom + slack)
+    return (bbox + (origin.x, origin.y, origin.x, origin.y)) & page.rect
+
+def parse_crop(text):
+    """Parse a crop spec from text: 'auto', '0.75' or 'x0,y0,x1,y1' in page points."""
+    if not text:
+        return None
+    if text.strip().lower() == "auto":
+        return "auto"
+    values = [float(v) for v in text.split(",")]
+    if len(values) == 1:
+        return values[0]
+    if len(values) == 4:
+        return tuple(values)
+    raise ValueError(f"Invalid crop '{text}'. Use a ratio such as 0.75 or x0,y0,x1,y1 in points.")
+
+def page_clip(page, crop=None, dpi=None):
+    """Clip rectangle for a crop spec on a loaded page; "auto" trims whitespace found by content_bbox()."""
+    return content_bbox(page) if crop == "auto" else crop_rect(page.rect, crop, dpi)
+
+def render_clip(page, crop, dpi, bits_per_pixel=24):
+    """
+    Clip rectangle and DPI for rendering a page: dpi may be an output target,
+    which is resolved against the clip, and a ratio crop is then snapped to
+    whole rows at the resolved DPI.
+    """
+    clip = page_clip(page, crop)
+    dpi = target_dpi(clip or page.rect, dpi, bits_per_pixel)
+    if clip is not None and isinstance(crop, (int, float)):
+        clip = crop_rect(page.rect, crop, dpi)
+    return clip, dpi
+
+def parse_dpi(text):
+    """Parse a resolution: a DPI such as '300', or an output target such as '8mp', '4000px' or '10mb'."""
+    text = str(text).strip().lower()
+    if text.isdigit():
+        if int(text) > 0:
+            return int(text)
+        raise ValueError(f"Invalid resolution '{text}'. The DPI must be greater than 0.")
+    for kind in TARGET_KINDS:
+        if text.endswith(kind):
+            try:
+                value = float(text[:-len(kind)])
+            except ValueError:
+                break
+            if 0 < value < float("inf"):
+                return (kind, value)
+            break
+    raise ValueError(f"Invalid resolution '{text}'. Use a DPI such as 300 or a target such as 8mp, 4000px or 10mb.")
+
+def _output_size(rect, dpi):
+    """Pixel width and height a render of rect (page points) at dpi produces."""
+    import fitz  # PyMuPDF
+    zoom = dpi / 72
+    irect = (fitz.Rect(rect) * fitz.Matrix(zoom, zoom)).round()
+    return irect.width, irect.height
+
+def dib_bytes(width, height, bits_per_pixel=24):
+    """Size of the pixel data of a CF_DIB payload; rows are padded to 4 bytes."""
+    return (width * bits_per_pixel + 31) // 32 * 4 * height
+
+def _within_target(width, height, target, bits_per_pixel):
+    kind, value = target
+    if kind == "mp":
+        return width * height <= value * 1e6
+    if kind == "px":
+        return max(width, height) <= value
+    return dib_bytes(width, height, bits_per_pixel) <= value * 1024 * 1024
+
+def target_dpi(rect, target, bits_per_pixel=24):
+    """
+    Highest whole DPI at which rect (page points) renders within an output
+    target, clamped to TARGET_DPI_RANGE so a tiny crop is not blown up
+    without limit. A plain number is returned unchanged.
+    """
+    if not isinstance(target, tuple):
+        return target
+    kind, value = target
+    if kind not in TARGET_KINDS:
+        raise ValueError(f"Unknown output target '{kind}'.")
+    width, height = rect.width / 72, rect.height / 72  # Inches
+    if kind == "mp":
+        dpi = (value * 1e6 / (width * height)) ** 0.5
+    elif kind == "px":
+        dpi = value / max(width, height)
+    else:
+        dpi = (value * 1024 * 1024 * 8 / bits_per_pixel / (width * height)) ** 0.5
+    low, high = TARGET_DPI_RANGE
+    dpi = max(low, min(high, int(dpi)))
+    # Rounding to whole pixels and row padding can push the estimate just over
+    while dpi > low and not _within_target(*_output_size(rect, dpi), target, bits_per_pixel):
+        dpi -= 1
+    return dpi
+
+def page_pixmap(page, dpi, crop=None, gray=False):
+    """
+    Render a loaded page to an RGB (or grayscale) pixmap at the given DPI or
+    output target. Cropping is done through the clip rectangle, so pixels
+    outside it are never rasterized.
+    """
+    import fitz  # PyMuPDF
+    clip, dpi = render_clip(page, crop, dpi, 8 if gray else 24)
+    zoom = dpi / 72  # PyMuPDF default resolution is 72 DPI
+    mat = fitz.Matrix(zoom, zoom)
+    irect = tiled.device_rect(page, dpi, clip).round()
+    with admit(irect.width * irect.height * (1 if gray else 3)), span("render.get_pixmap", dpi=dpi):
+        return page.get_pixmap(matrix=mat, clip=clip, colorspace=fitz.csGRAY if gray else fitz.csRGB, alpha=False)
+
+def page_count(pdf_file):
+    """Number of pages in a PDF."""
+    with get_documents().borrow(pdf_file) as doc:
+        return doc.page_count
+
+def thumbnail(pix, max_width, max_height):
+    """Scale a pixmap down (never up) to fit within max_width x max_height, keeping its aspect ratio."""
+    import fitz  # PyMuPDF
+    scale = min(max_width / pix.width, max_height / pix.height, 1)
+    if scale == 1:
+        return pix
+    with span("encode.thumbnail"):
+        return fitz.Pixmap(pix, max(1, int(pix.width * scale)), max(1, int(pix.height * scale)), None)
+
+def page_dib(page, dpi, crop=None, strip_bytes=tiled.DEFAULT_STRIP_BYTES, mode="color"):
+    """
+    Render a loaded page straight to a CF_DIB payload in one of RENDER_MODES,
+    at a DPI or within an output target. Pages whose raster would exceed
+    strip_bytes (or what the memory budget leaves beside the payload) are
+    rendered in horizontal strips, so the full pixmap never exists alongside
+    the payload.
+    """
+    bits = RENDER_MODES[mode]
+    clip, dpi = render_clip(page, crop, dpi, bits)
+    irect = tiled.device_rect(page, dpi, clip).round()
+    raster = irect.width * irect.height * (3 if bits == 24 else 1)
+    with admit(raster, dib_bytes(irect.width, irect.height, bits), strip_bytes) as strip_bytes:
+        with span("render.dib", dpi=dpi, mode=mode):
+            return tiled.render_dib(page, dpi, clip, strip_bytes, bits)
+
+def page_snippet(page, crop=None):
+    """
+    New single-page PDF document showing the page, or just its crop region,
+    as the original vector content (placed as a form XObject, not rasterized).
+    """
+    import fitz  # PyMuPDF
+    clip = page_clip(page, crop) or page.rect
+    snippet = fitz.open()
+    target = snippet.new_page(width=clip.width, height=clip.height)
+    target.show_pdf_page(target.rect, page.parent, page.number, clip=clip)
+    return snippet
+
+def vector_payloads(page, crop=None):
+    """
+    SVG and single-page PDF bytes for the page (or crop region). Text is drawn
+    as paths in the SVG so it does not depend on the reader's fonts.
+    """
+    with span("render.vector"):
+        snippet = page_snippet(page, crop)
+        try:
+            svg = snippet[0].get_svg_image(text_as_path=True).encode("utf-8")
+            pdf = snippet.tobytes(garbage=3, deflate=True)
+        finally:
+            snippet.close()
+    return svg, pdf
+
+def save_page(page, dpi, path, fmt="png", crop=None):
+    """
+    Render a loaded page to an image file. PNG and PNM pages too large to
+    rasterize in one piece are streamed to the file in strips; SVG and PDF
+    keep the page as vectors and ignore dpi. An output target is applied to
+    the raw RGB raster, so compressed formats come out smaller.
+    """
+    import fitz  # PyMuPDF
+    if fmt in VECTOR_FORMATS:
+        svg, pdf = vector_payloads(page, crop)
+        with open(path, "wb") as f:
+            f.write(svg if fmt == "svg" else pdf)
+        return path
+    clip, dpi = render_clip(page, crop, dpi)
+    irect = tiled.device_rect(page, dpi, clip).round()
+    # Only PNG and PNM can be streamed in strips; other formats need the whole pixmap
+    strip = tiled.DEFAULT_STRIP_BYTES if fmt in tiled.FILE_WRITERS else None
+    with admit(irect.width * irect.height * 3, strip=strip) as strip:
+        if strip is not None and not tiled.fits_in_strip(page, dpi, clip, strip):
+            return tiled.render_to_file(page, dpi, path, fmt, clip, strip)
+        zoom = dpi / 72
+        page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False).save(path, output=fmt)
+    return path
+
+def _load_page(doc, page_num):
+    if page_num < 1 or page_num > doc.page_count:
+        raise ValueError(f"Page {page_num} does not exist. PDF has {doc.page_count} pages.")
+    return doc.load_page(page_num - 1)
+
+def render_page(pdf_file, page_num, dpi, crop=None, gray=False):
+    """Render a single 1-based page number of a PDF to a pixmap, reusing an already open document."""
+    with get_documents().borrow(pdf_file) as doc:
+        return page_pixmap(_load_page(doc, page_num), dpi, crop, gray)
+
+def render_page_dib(pdf_file, page_num, dpi, crop=None, mode="color"):
+    """Render a single 1-based page number of a PDF to a CF_DIB payload, reusing an already open document."""
+    with get_documents().borrow(pdf_file) as doc:
+        return page_dib(_load_page(doc, page_num), dpi, crop, mode=mode)
+
+def render_page_vector(pdf_file, page_num, crop=None):
+    """
+    Vector capture of a single 1-based page: (svg, pdf, fallback_dib), where
+    fallback_dib is a VECTOR_FALLBACK_DPI bitmap for applications that only paste images.
+    """
+    with get_documents().borrow(pdf_file) as doc:
+        page = _load_page(doc, page_num)
+        return vector_payloads(page, crop) + (page_dib(page, VECTOR_FALLBACK_DPI, crop),)
+
+def parse_page_spec(spec, page_count):
+    """
+    Parse a page selection such as "1-200,205" into a sorted list of unique
+    1-based page numbers. An empty spec or "all" selects every page.
+    """
+    if not spec or spec.strip().lower() == "all":
+        return list(range(1, page_count + 1))
+    selected = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else page_count
+        else:
+            first = last = int(part)
+        if first < 1 or last > page_count or first > last:
+            raise ValueError(f"Invalid page range '{part}' for a PDF with {page_count} pages.")
+        selected.update(range(first, last + 1))
+    return sorted(selected)
+
+def output_path(out_dir, page_num, fmt="png"):
+    """Deterministic output file name for a rendered page."""
+    return os.path.join(out_dir, f"page-{page_num:04d}.{fmt}")
+
+# Each worker process opens the document once and reuses it for every page
+_worker_doc = None
+
+def _init_worker(pdf_file, scheduler=None):
+    global _worker_doc
+    import fitz  # PyMuPDF
+    if scheduler is not None:
+        set_scheduler(scheduler)
+    _worker_doc = fitz.open(pdf_file)
+
+def _render_to_file(job):
+    page_num, dpi, crop, out_dir, fmt = job
+    page = _worker_doc.load_page(page_num - 1)
+    path = output_path(out_dir, page_num, fmt)
+    with span("render.file", page=page_num, dpi=dpi, format=fmt):
+        return save_page(page, dpi, path, fmt, crop)
+
+def render_pages(pdf_file, page_numbers, dpi, out_dir, workers=None, fmt="png", crop=None):
+    """
+    Render the given 1-based pages of a PDF to image files in out_dir, spread
+    across a process pool. The workers share this process's render memory
+    budget. Returns the output paths in page order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(page_num, dpi, crop, out_dir, fmt) for page_num in page_numbers]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(jobs)))
+
+    if workers == 1:
+        _init_worker(pdf_file)
+        try:
+            return [_render_to_file(job) for job in jobs]
+        finally:
+            _worker_doc.close()
+
+    # Hand out contiguous runs of pages so each worker walks the file in order
+    chunksize = max(1, len(jobs) // (workers * 4))
+    local = get_scheduler()
+    with shared_scheduler(local.max_bytes) as scheduler:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(pdf_file, scheduler)) as executor:
+                return list(executor.map(_render_to_file, jobs, chunksize=chunksize))
+        finally:
+            local.merge(scheduler.stats())
+
+def main(argv=None):
+    """Command line entry point: render [pdf] --pages 1-200 --dpi 300 --out dir/"""
+    parser = argparse.ArgumentParser(prog="main.py render", description="Render PDF pages to image files.")
+    parser.add_argument("pdf", help="PDF file to render")
+    parser.add_argument("--pages", default="all", help="Pages to render, e.g. 1-200,205 (default: all)")
+    parser.add_argument("--dpi", default="300",
+                        help="Render resolution, or a per-page output target such as 8mp, 4000px or 10mb (default: 300)")
+    parser.add_argument("--out", default=".", help="Output directory (default: current directory)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--format", default="png", choices=["png", "pnm", "psd"] + list(VECTOR_FORMATS),
+                        help="Output image format; svg and pdf keep the page as vectors")
+    parser.add_argument("--memory-budget", type=int, default=None, metavar="MB",
+                        help="Memory that concurrent renders may reserve in total (default: %d)"
+                             % (get_scheduler().max_bytes // (1024 * 1024)))
+    parser.add_argument("--crop", default=None,
+                        help="auto (trim whitespace), top fraction to keep (e.g. 0.75), or x0,y0,x1,y1 in page points")
+    args = parser.parse_args(argv)
+
+    import fitz  # PyMuPDF
+    try:
+        page_numbers = parse_page_spec(args.pages, page_count(args.pdf))
+        crop = parse_crop(args.crop)
+        dpi = parse_dpi(args.dpi)
+    except (ValueError, OSError, fitz.FileDataError) as e:
+        parser.error(str(e))
+    if args.memory_budget:
+        get_scheduler().max_bytes = args.memory_budget * 1024 * 1024
+
+    with span("render.pages", pages=len(page_numbers), dpi=dpi):
+        paths = render_pages(args.pdf, page_numbers, dpi, args.out, args.workers, args.format, crop)
+    print(f"Rendered {len(paths)} pages to {os.path.abspath(args.out)}")
+    print(get_scheduler().summary())
+    return 0
@@ -0,0 +1,383 @@
+"""
+Read column widths and row heights straight from .xls (BIFF8) and .xlsx files,
+without Excel and without loading cell values.
+
+Widths are returned in Excel character units and heights in points, the same
+units xlwings reports for Range.column_width and Range.row_height.
+"""
+import math
+import os
+import re
+import struct
+import zipfile
+from instrumentation import span
+import xml.etree.ElementTree as ET
+
+MAX_DIGIT_WIDTH_PX = 7   # Calibri 11 / Arial 10 at 100% zoom
+DEFAULT_ROW_HEIGHT_PT = 15.0
+DEFAULT_BASE_COL_WIDTH = 8
+
+class GeometryError(Exception):
+    """Raised when a workbook's geometry cannot be read natively."""
+
+# ---------------------------------------------------------------------------
+# A1 address helpers
+
+_CELL_RE = re.compile(r"^\$?([A-Za-z]{1,3})\$?(\d+)$")
+
+def column_index(letters):
+    """'A' -> 1, 'AD' -> 30"""
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index
+
+def column_letters(index):
+    """1 -> 'A', 30 -> 'AD'"""
+    letters = ""
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+def parse_range(range_address):
+    """Parse 'B2:AD88' into 1-based (first_row, first_col, last_row, last_col)."""
+    parts = range_address.replace(" ", "").split(":")
+    if len(parts) == 1:
+        parts = parts * 2
+    cells = [_CELL_RE.match(p) for p in parts]
+    if len(cells) != 2 or not all(cells):
+        raise ValueError(f"Invalid cell range: '{range_address}'")
+    (c0, r0), (c1, r1) = [(column_index(m.group(1)), int(m.group(2))) for m in cells]
+    return min(r0, r1), min(c0, c1), max(r0, r1), max(c0, c1)
+
+def format_range(first_row, first_col, last_row, last_col):
+    """Absolute A1 address in the same form xlwings returns, e.g. '$B$2:$AD$30'."""
+    return f"${column_letters(first_col)}${first_row}:${column_letters(last_col)}${last_row}"
+
+# ---------------------------------------------------------------------------
+# Geometry model
+
+def stored_width_to_chars(width, mdw=MAX_DIGIT_WIDTH_PX):
+    """Convert a stored column width (characters plus padding) to Excel's ColumnWidth."""
+    pixels = int(width * mdw + 0.5)
+    if pixels <= 0:
+        return 0.0
+    if pixels < mdw + 5:
+        return math.floor(pixels / (mdw + 5) * 100 + 0.5) / 100
+    return math.floor((pixels - 5) / mdw * 100 + 0.5) / 100
+
+def default_width_to_chars(base_width, mdw=MAX_DIGIT_WIDTH_PX):
+    """ColumnWidth of an unformatted column; Excel rounds its pixel width up to a multiple of 8."""
+    pixels = math.ceil((base_width * mdw + 5) / 8) * 8
+    return math.floor((pixels - 5) / mdw * 100 + 0.5) / 100
+
+class SheetGeometry:
+    """Column widths (characters) and row heights (points) of one worksheet."""
+
+    def __init__(self, col_widths, row_heights, default_col_width, default_row_height):
+        self.col_widths = col_widths      # 1-based column -> width
+        self.row_heights = row_heights    # 1-based row -> height
+        self.default_col_width = default_col_width
+        self.default_row_height = default_row_height
+
+    def column_widths(self, first_col, last_col):
+        get = self.col_widths.get
+        return [get(c, self.default_col_width) for c in range(first_col, last_col + 1)]
+
+    def row_heights_for(self, first_row, last_row):
+        get = self.row_heights.get
+        return [get(r, self.default_row_height) for r in range(first_row, last_row + 1)]
+
+    def range_geometry(self, range_address):
+        """Return (column widths, row heights) for an A1 range."""
+        r0, c0, r1, c1 = parse_range(range_address)
+        return self.column_widths(c0, c1), self.row_heights_for(r0, r1)
+
+def read_geometry(file_path, sheet_name):
+    """Read the geometry of one sheet from an .xls or .xlsx/.xlsm workbook."""
+    with open(file_path, "rb") as f:
+        magic = f.read(8)
+    if magic == _CFB_MAGIC:
+        with span("layout.read_geometry", format="xls"):
+            return _read_xls_geometry(file_path, sheet_name)
+    if magic[:4] == b"PK\x03\x04":
+        with span("layout.read_geometry", format="xlsx"):
+            return _read_xlsx_geometry(file_path, sheet_name)
+    raise GeometryError(f"Unsupported workbook format: {os.path.basename(file_path)}")
+
+def read_sheet_names(file_path):
+    """List worksheet names without opening the workbook in Excel."""
+    with open(file_path, "rb") as f:
+        magic = f.read(8)
+    if magic == _CFB_MAGIC:
+        with _CompoundFile(file_path) as cfb:
+            stream = cfb.open_workbook_stream()
+            return [name for name, _ in _read_boundsheets(stream)]
+    if magic[:4] == b"PK\x03\x04":
+        with zipfile.ZipFile(file_path) as zf:
+            return list(_xlsx_sheet_targets(zf))
+    raise GeometryError(f"Unsupported workbook format: {os.path.basename(file_path)}")
+
+# ---------------------------------------------------------------------------
+# OLE2 compound file (the container around BIFF8 .xls workbooks)
+
+_CFB_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_ENDOFCHAIN = 0xFFFFFFFE
+
+class _CompoundFile:
+    """Minimal read-only compound file reader that loads stream sectors on demand."""
+
+    def __init__(self, path):
+        self.f = open(path, "rb")
+        header = self.f.read(512)
+        if header[:8] != _CFB_MAGIC:
+            raise GeometryError("Not an OLE2 compound file.")
+        self.sector_size = 1 << struct.unpack_from("<H", header, 0x1E)[0]
+        self.mini_sector_size = 1 << struct.unpack_from("<H", header, 0x20)[0]
+        (n_fat, first_dir, _, self.mini_cutoff, first_minifat, n_minifat,
+         first_difat, n_difat) = struct.unpack_from("<IIIIIIII", header, 0x2C)
+
+        # Locate every FAT sector via the header DIFAT and any DIFAT sectors
+        fat_sectors = list(struct.unpack_from("<109I", header, 0x4C))
+        sector = first_difat
+        per_difat = self.sector_size // 4 - 1
+        for _ in range(n_difat):
+            data = self._read_sector(sector)
+            fat_sectors.extend(struct.unpack_from(f"<{per_difat}I", data))
+            sector = struct.unpack_from("<I", data, per_difat * 4)[0]
+        self.fat = []
+        for sector in fat_sectors[:n_fat]:
+            self.fat.extend(struct.unpack(f"<{self.sector_size // 4}I", self._read_sector(sector)))
+
+        directory = b"".join(self._read_sector(s) for s in self._chain(first_dir))
+        self.entries = []
+        for offset in range(0, len(directory), 128):
+            name_len, kind = struct.unpack_from("<HB", directory, offset + 64)
+            name = directory[offset:offset + max(0, name_len - 2)].decode("utf-16-le", "replace")
+            start, size = struct.unpack_from("<IQ", directory, offset + 116)
+            if self.sector_size == 512:
+                size &= 0xFFFFFFFF  # Version 3 files leave the high dword undefined
+            self.entries.append((name, kind, start, size))
+
+        self.minifat = []
+        if n_minifat:
+            data = b"".join(self._read_sector(s) for s in self._chain(first_minifat))
+            self.minifat = list(struct.unpack(f"<{len(data) // 4}I", data))
+        root = self.entries[0]
+        self.mini_stream_sectors = list(self._chain(root[2])) if root[3] else []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+    def _read_sector(self, sector):
+        self.f.seek((sector + 1) * self.sector_size)
+        return self.f.read(self.sector_size)
+
+    def _chain(self, start, table=None):
+        table = self.fat if table is None else table
+        sector = start
+        seen = 0
+        while sector < _ENDOFCHAIN - 4 and seen <= len(table):
+            yield sector
+            sector = table[sector]
+            seen += 1
+
+    def open_workbook_stream(self):
+        for name, kind, start, size in self.entries:
+            if kind == 2 and name in ("Workbook", "Book"):
+                if size < self.mini_cutoff:
+                    return _MiniStream(self, start, size)
+                return _SectorStream(self, list(self._chain(start)), size)
+        raise GeometryError("No Workbook stream found.")
+
+class _SectorStream:
+    """File-like view over a chain of regular sectors; supports seek and read."""
+
+    def __init__(self, cfb, sectors, size):
+        self.cfb = cfb
+        self.sectors = sectors
+        self.size = size
+        self.pos = 0
+
+    def seek(self, pos):
+        self.pos = pos
+
+    def skip(self, n):
+        self.pos += n
+
+    def read(self, n):
+        n = max(0, min(n, self.size - self.pos))
+        out = bytearray()
+        sector_size = self.cfb.sector_size
+        while n > 0:
+            index, offset = divmod(self.pos, sector_size)
+            take = min(n, sector_size - offset)
+            self.cfb.f.seek((self.sectors[index] + 1) * sector_size + offset)
+            out += self.cfb.f.read(take)
+            self.pos += take
+            n -= take
+        return bytes(out)
+
+class _MiniStream(_SectorStream):
+    """Small streams live in 64-byte mini sectors inside the root entry's stream."""
+
+    def __init__(self, cfb, start, size):
+        mini = _SectorStream(cfb, cfb.mini_stream_sectors, len(cfb.mini_stream_sectors) * cfb.sector_size)
+        data = bytearray()
+        for sector in cfb._chain(start, cfb.minifat):
+            mini.seek(sector * cfb.mini_sector_size)
+            data += mini.read(cfb.mini_sector_size)
+        self.data = bytes(data[:size])
+        self.size = size
+        self.pos = 0
+
+    def read(self, n):
+        out = self.data[self.pos:self.pos + n]
+        self.pos += len(out)
+        return out
+
+# ---------------------------------------------------------------------------
+# BIFF8 records
+
+_BOF, _EOF = 0x0809, 0x000A
+_FILEPASS = 0x002F
+_BOUNDSHEET = 0x0085
+_DEFCOLWIDTH = 0x0055
+_STANDARDWIDTH = 0x0099
+_COLINFO = 0x007D
+_ROW = 0x0208
+_DEFAULTROWHEIGHT = 0x0225
+
+_GEOMETRY_RECORDS = {_DEFCOLWIDTH, _STANDARDWIDTH, _COLINFO, _ROW, _DEFAULTROWHEIGHT}
+
+def _records(stream, wanted):
+    """Yield (type, body) for wanted record types, skipping over all other bodies unread."""
+    while True:
+        header = stream.read(4)
+        if len(header) < 4:
+            return
+        rtype, length = struct.unpack("<HH", header)
+        if rtype in wanted:
+            yield rtype, stream.read(length)
+        else:
+            stream.skip(length)
+        if rtype == _EOF:
+            return
+
+def _read_boundsheets(stream):
+    stream.seek(0)
+    sheets = []
+    for rtype, body in _records(stream, {_BOF, _BOUNDSHEET, _FILEPASS, _EOF}):
+        if rtype == _BOF and struct.unpack_from("<H", body)[0] != 0x0600:
+            raise GeometryError("Only BIFF8 (Excel 97-2003) .xls workbooks are supported.")
+        if rtype == _FILEPASS:
+            raise GeometryError("Workbook is encrypted.")
+        if rtype == _BOUNDSHEET:
+            offset, _, kind, cch, high_byte = struct.unpack_from("<IBBBB", body)
+            raw = body[8:8 + cch * (2 if high_byte & 1 else 1)]
+            name = raw.decode("utf-16-le" if high_byte & 1 else "latin-1")
+            if kind == 0:  # worksheet (not chart, macro or VB module)
+                sheets.append((name, offset))
+    return sheets
+
+def _read_xls_geometry(file_path, sheet_name):
+    with _CompoundFile(file_path) as cfb:
+        stream = cfb.open_workbook_stream()
+        offsets = dict(_read_boundsheets(stream))
+        if sheet_name not in offsets:
+            raise GeometryError(f"Sheet '{sheet_name}' not found.")
+        stream.seek(offsets[sheet_name])
+        if stream.read(2) != struct.pack("<H", _BOF):
+            raise GeometryError("Sheet substream does not start with BOF.")
+        stream.seek(offsets[sheet_name])
+
+        col_widths, row_heights = {}, {}
+        base_width = DEFAULT_BASE_COL_WIDTH
+        standard_width = None
+        default_row_height = DEFAULT_ROW_HEIGHT_PT
+        for rtype, body in _records(stream, _GEOMETRY_RECORDS | {_EOF}):
+            if rtype == _ROW:
+                row, height, flags = struct.unpack_from("<H4xH4xH", body)
+                hidden = flags & 0x20
+                row_heights[row + 1] = 0.0 if hidden else (height & 0x7FFF) / 20
+            elif rtype == _COLINFO:
+                first, last, width, _, flags = struct.unpack_from("<HHHHH", body)
+                chars = 0.0 if flags & 0x01 else stored_width_to_chars(width / 256)
+                for col in range(first + 1, min(last, 16383) + 2):
+                    col_widths[col] = chars
+            elif rtype == _DEFCOLWIDTH:
+                base_width = struct.unpack_from("<H", body)[0]
+            elif rtype == _STANDARDWIDTH:
+                standard_width = struct.unpack_from("<H", body)[0] / 256
+            elif rtype == _DEFAULTROWHEIGHT:
+                flags, height = struct.unpack_from("<HH", body)
+                default_row_height = 0.0 if flags & 0x02 else height / 20
+
+    if standard_width is not None:
+        default_col_width = stored_width_to_chars(standard_width)
+    else:
+        default_col_width = default_width_to_chars(base_width)
+    return SheetGeometry(col_widths, row_heights, default_col_width, default_row_height)
+
+# ---------------------------------------------------------------------------
+# Office Open XML (.xlsx / .xlsm)
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+def _xlsx_sheet_targets(zf):
+    """Map sheet name -> part name of its worksheet XML."""
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{_NS_PKG_REL}Relationship")}
+    sheets = {}
+    for sheet in workbook.iter(f"{_NS_MAIN}sheet"):
+        target = targets.get(sheet.get(f"{_NS_REL}id"), "")
+        sheets[sheet.get("name")] = target.lstrip("/") if target.startswith("/") else "xl/" + target
+    return sheets
+
+def _read_xlsx_geometry(file_path, sheet_name):
+    with zipfile.ZipFile(file_path) as zf:
+        targets = _xlsx_sheet_targets(zf)
+        if sheet_name not in targets:
+            raise GeometryError(f"Sheet '{sheet_name}' not found.")
+        col_widths, row_heights = {}, {}
+        base_width = DEFAULT_BASE_COL_WIDTH
+        default_col_width = None
+        default_row_height = DEFAULT_ROW_HEIGHT_PT
+        row = 0
+        with zf.open(targets[sheet_name]) as part:
+            for event, elem in ET.iterparse(part, events=("start", "end")):
+                tag = elem.tag
+                if event == "start":
+                    if tag == f"{_NS_MAIN}row":
+                        row = int(elem.get("r", row + 1))
+                        if elem.get("hidden") in ("1", "true"):
+                            row_heights[row] = 0.0
+                        elif elem.get("ht") is not None:
+                            row_heights[row] = float(elem.get("ht"))
+                    elif tag == f"{_NS_MAIN}col":
+                        first, last = int(elem.get("min")), int(elem.get("max"))
+                        hidden = elem.get("hidden") in ("1", "true")
+                        chars = 0.0 if hidden else stored_width_to_chars(float(elem.get("width", 0)))
+                        for col in range(first, min(last, 16384) + 1):
+                            col_widths[col] = chars
+                    elif tag == f"{_NS_MAIN}sheetFormatPr":
+                        base_width = int(elem.get("baseColWidth", base_width))
+                        if elem.get("defaultColWidth") is not None:
+                            default_col_width = stored_width_to_chars(float(elem.get("defaultColWidth")))
+                        default_row_height = float(elem.get("defaultRowHeight", default_row_height))
+                        if elem.get("zeroHeight") in ("1", "true"):
+                            default_row_height = 0.0
+                elif tag == f"{_NS_MAIN}row":
+                    elem.clear()  # Drop the row's cells as soon as they are parsed
+                elif tag == f"{_NS_MAIN}sheetData":
+                    break
+    if default_col_width is None:
+        default_col_width = default_width_to_chars(base_width)
+    return SheetGeometry(col_widths, row_heights, default_col_width, default_row_height)
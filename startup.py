@@ -0,0 +1,68 @@
+"""
+Cold-start helpers for the Tk tools.
+
+The GUIs import only light modules before their window appears; PyMuPDF,
+NumPy, xlwings and the win32 modules are imported where they are first used.
+Once the window has painted, warm_up() imports them on a background thread so
+the first capture does not pay for them either.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+# Modules the capture pipeline needs sooner or later, in the order they are wanted
+HEAVY_MODULES = ("fitz", "numpy")
+
+# Fallback launch time when the OS cannot tell us when the process started
+_IMPORT_TIME = time.time()
+
+def process_start_time():
+    """Wall-clock time (epoch seconds) at which this process was created."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            creation, exit_, kernel, user = (wintypes.FILETIME() for _ in range(4))
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.kernel32.GetProcessTimes(process, ctypes.byref(creation), ctypes.byref(exit_),
+                                                      ctypes.byref(kernel), ctypes.byref(user)):
+                ticks = (creation.dwHighDateTime << 32) | creation.dwLowDateTime  # 100 ns since 1601
+                return ticks / 1e7 - 11644473600
+        elif sys.platform.startswith("linux"):
+            with open("/proc/self/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open("/proc/stat") as f:
+                boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+            return boot_time + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, AttributeError, StopIteration):
+        pass
+    return _IMPORT_TIME
+
+def warm_up(modules=HEAVY_MODULES):
+    """Import modules on a daemon thread; import errors are left for first use to report."""
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def on_first_paint(root, modules=HEAVY_MODULES, report=print):
+    """
+    Once the window has drawn, report the time since the process started and
+    start warming up modules. Call just before root.mainloop(); the idle
+    callback queues behind the window's own pending redraws.
+    """
+    from instrumentation import event
+
+    def painted():
+        elapsed = time.time() - process_start_time()
+        event("startup.first_paint", seconds=round(elapsed, 4))
+        report(f"First paint {elapsed * 1000:.0f} ms after launch")
+        warm_up(modules)
+    root.after_idle(painted)
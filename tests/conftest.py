@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The tools are flat top-level modules; make them importable from the tests
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,87 @@
+"""Renders are admitted while their reserved memory fits the budget, in one process or across a pool."""
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import admission
+from admission import MIN_STRIP_BYTES, RenderScheduler, admit, set_scheduler, shared_scheduler
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RenderScheduler(100 * MB)
+    monkeypatch.setattr(admission, "_scheduler", scheduler)
+    return scheduler
+
+def acquire_in_thread(scheduler, *args):
+    """Start acquire(*args) on a thread; returns the thread and a list that receives its result."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(scheduler.acquire(*args)), daemon=True)
+    thread.start()
+    return thread, result
+
+def test_render_within_budget_is_admitted_at_once(scheduler):
+    assert scheduler.acquire(40 * MB, 10 * MB) == (None, 50 * MB)
+    assert scheduler.acquire(30 * MB, 0, 64 * MB) == (64 * MB, 30 * MB)
+    stats = scheduler.stats()
+    assert (stats["renders"], stats["waits"], stats["reserved_bytes"], stats["peak_bytes"]) == (2, 0, 80 * MB, 80 * MB)
+
+def test_render_waits_until_memory_is_released(scheduler):
+    _, first = scheduler.acquire(60 * MB)
+    thread, result = acquire_in_thread(scheduler, 60 * MB)
+    time.sleep(0.1)
+    assert result == [] and thread.is_alive()
+    scheduler.release(first)
+    thread.join(5)
+    assert result == [(None, 60 * MB)]
+    stats = scheduler.stats()
+    assert (stats["waits"], stats["peak_bytes"], stats["max_queued"]) == (1, 60 * MB, 1)
+    assert stats["wait_seconds"] > 0
+
+def test_oversized_render_gets_smaller_strips(scheduler):
+    strip, reserved = scheduler.acquire(500 * MB, 30 * MB, 256 * MB)
+    assert (strip, reserved) == (70 * MB, 100 * MB)
+    assert scheduler.stats()["smaller_strips"] == 1
+
+def test_strips_are_not_made_smaller_than_the_minimum(scheduler):
+    strip, reserved = scheduler.acquire(500 * MB, 120 * MB, 256 * MB)
+    assert (strip, reserved) == (MIN_STRIP_BYTES, 120 * MB + MIN_STRIP_BYTES)
+    assert scheduler.stats()["over_budget"] == 1
+
+def test_render_that_cannot_fit_runs_alone(scheduler):
+    _, small = scheduler.acquire(10 * MB)
+    thread, result = acquire_in_thread(scheduler, 300 * MB)
+    time.sleep(0.1)
+    assert result == []
+    scheduler.release(small)
+    thread.join(5)
+    assert result == [(None, 300 * MB)]
+    assert scheduler.stats()["over_budget"] == 1
+
+def test_admit_releases_on_error(scheduler):
+    with pytest.raises(RuntimeError):
+        with admit(30 * MB, 10 * MB, 64 * MB) as strip:
+            assert strip == 64 * MB
+            assert scheduler.stats()["reserved_bytes"] == 40 * MB
+            raise RuntimeError("render failed")
+    assert scheduler.stats()["reserved_bytes"] == 0
+
+def test_merge_adds_counts_and_keeps_peaks(scheduler):
+    scheduler.acquire(20 * MB)
+    scheduler.merge({"renders": 3, "waits": 2, "peak_bytes": 90 * MB, "max_queued": 1,
+                     "max_bytes": 1, "reserved_bytes": 1})
+    stats = scheduler.stats()
+    assert (stats["renders"], stats["waits"], stats["peak_bytes"], stats["max_queued"]) == (4, 2, 90 * MB, 1)
+    assert (stats["max_bytes"], stats["reserved_bytes"]) == (100 * MB, 20 * MB)
+
+def _render_in_worker(raster):
+    with admit(raster):
+        return admission.get_scheduler().stats()["reserved_bytes"] >= raster
+
+def test_shared_scheduler_counts_renders_of_every_process():
+    with shared_scheduler(100 * MB) as scheduler:
+        with ProcessPoolExecutor(max_workers=2, initializer=set_scheduler, initargs=(scheduler,)) as pool:
+            assert all(pool.map(_render_in_worker, [10 * MB] * 4))
+        stats = scheduler.stats()
+    assert (stats["renders"], stats["reserved_bytes"]) == (4, 0)
@@ -0,0 +1,40 @@
+"""CF_DIB payloads built from pixmap samples must match the old PNG -> PIL -> BMP path byte for byte."""
+import io
+import pytest
+import clipboard
+from clipboard import FileClipboardSink, copy_pixmap_to_clipboard, pixmap_to_dib
+
+fitz = pytest.importorskip("fitz")
+Image = pytest.importorskip("PIL.Image")
+
+def legacy_dib(pix):
+    """The payload the tools used to build: PNG bytes through PIL, saved as BMP without its file header."""
+    image = Image.open(io.BytesIO(pix.tobytes("png")))
+    with io.BytesIO() as output:
+        image.save(output, format="BMP")
+        return output.getvalue()[14:]
+
+@pytest.fixture
+def page():
+    doc = fitz.open()
+    # An odd width, so BMP rows need padding at most DPIs
+    page = doc.new_page(width=301, height=211)
+    page.insert_text((20, 40), "Completion String", fontsize=14)
+    page.draw_rect(fitz.Rect(10, 60, 290, 200), color=(0.8, 0.1, 0.1), fill=(0.2, 0.5, 0.9))
+    yield page
+    doc.close()
+
+@pytest.mark.parametrize("dpi", [72, 100, 150, 301])
+def test_pixmap_to_dib_matches_legacy_payload(page, dpi):
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    assert pixmap_to_dib(pix) == legacy_dib(pix)
+
+def test_published_dib_matches_legacy_payload(page, tmp_path, monkeypatch):
+    monkeypatch.setattr(clipboard, "publish_png", False)
+    monkeypatch.setattr(clipboard, "publish_file_drop", False)
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
+    sink = FileClipboardSink(str(tmp_path))
+    copy_pixmap_to_clipboard(pix, sink)
+    with open(sink.path_for("CF_DIB"), "rb") as f:
+        assert f.read() == legacy_dib(pix)
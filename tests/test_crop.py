@@ -0,0 +1,39 @@
+"""Ratio crops rendered through a clip rectangle must match cropping a full render."""
+import struct
+import pytest
+from clipboard import pixmap_to_dib
+from render_engine import RENDER_MODES, dib_bytes, page_dib, page_pixmap
+
+fitz = pytest.importorskip("fitz")
+
+@pytest.fixture(scope="module")
+def page():
+    doc = fitz.open()
+    page = doc.new_page(width=842, height=595)  # Landscape A4
+    for y in range(20, 595, 37):
+        page.insert_text((30, y), f"Row at {y} pt", fontsize=11)
+    page.draw_rect(fitz.Rect(400, 50, 800, 560), color=(0, 0, 0), fill=(0.3, 0.6, 0.2))
+    yield page
+    doc.close()
+
+@pytest.mark.parametrize("dpi", [72, 100, 150, 300, 600])
+@pytest.mark.parametrize("ratio", [0.0001, 0.001, 0.25, 0.5, 0.77, 0.771, 0.999])
+def test_ratio_crop_keeps_the_rows_of_the_old_crop(page, dpi, ratio):
+    zoom = dpi / 72
+    full = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    rows = max(1, int(full.height * ratio))
+    cropped = page_pixmap(page, dpi, ratio)
+    assert (cropped.width, cropped.height) == (full.width, rows)
+    assert cropped.samples == full.samples[:rows * full.stride]
+
+@pytest.mark.parametrize("dpi", [72, 600])
+@pytest.mark.parametrize("mode", ["color", "bw"])
+def test_tiny_ratio_dib_keeps_one_row(page, dpi, mode):
+    zoom = dpi / 72
+    full = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False,
+                           colorspace=fitz.csRGB if mode == "color" else fitz.csGRAY)
+    row_bytes = dib_bytes(full.width, 1, RENDER_MODES[mode])
+    dib = page_dib(page, dpi, 0.0001, mode=mode)
+    assert struct.unpack_from("<ii", dib, 4) == (full.width, 1)
+    # Rows are stored bottom-up, so the top row of the page ends both payloads
+    assert dib[-row_bytes:] == pixmap_to_dib(full, RENDER_MODES[mode])[-row_bytes:]
@@ -0,0 +1,75 @@
+"""Open PDFs are reused until the file changes or falls out of the cache, and never closed while borrowed."""
+import os
+import pytest
+from document_cache import DocumentCache
+
+fitz = pytest.importorskip("fitz")
+
+def write_pdf(path, pages=1):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def test_open_document_is_reused(tmp_path):
+    cache = DocumentCache()
+    path = write_pdf(tmp_path / "a.pdf")
+    with cache.borrow(path) as first:
+        pass
+    with cache.borrow(path) as second:
+        assert second is first and not second.is_closed
+    assert cache.stats() == {"hits": 1, "misses": 1, "open": 1}
+
+def test_changed_file_is_reopened(tmp_path):
+    cache = DocumentCache()
+    path = write_pdf(tmp_path / "a.pdf")
+    with cache.borrow(path) as old:
+        assert old.page_count == 1
+    write_pdf(path, pages=3)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    with cache.borrow(path) as new:
+        assert new.page_count == 3
+    assert old.is_closed
+    assert len(cache) == 1
+
+def test_least_recently_used_document_is_closed(tmp_path):
+    cache = DocumentCache(max_documents=2)
+    paths = [write_pdf(tmp_path / f"{name}.pdf") for name in "abc"]
+    docs = []
+    for path in paths:
+        with cache.borrow(path) as doc:
+            docs.append(doc)
+    assert [doc.is_closed for doc in docs] == [True, False, False]
+    assert len(cache) == 2
+
+def test_borrowed_document_is_closed_when_returned(tmp_path):
+    cache = DocumentCache(max_documents=1)
+    first, second = write_pdf(tmp_path / "a.pdf"), write_pdf(tmp_path / "b.pdf")
+    with cache.borrow(first) as doc:
+        with cache.borrow(second):
+            pass
+        assert not doc.is_closed and doc.page_count == 1
+    assert doc.is_closed
+
+def test_close_all(tmp_path):
+    cache = DocumentCache()
+    first, second = write_pdf(tmp_path / "a.pdf"), write_pdf(tmp_path / "b.pdf")
+    with cache.borrow(first) as kept:
+        pass
+    with cache.borrow(second) as borrowed:
+        cache.close_all()
+        assert kept.is_closed and not borrowed.is_closed
+    assert borrowed.is_closed
+    assert len(cache) == 0
+
+def test_memory_mapped_document(tmp_path):
+    cache = DocumentCache(mmap_bytes=1)
+    path = write_pdf(tmp_path / "a.pdf", pages=2)
+    with cache.borrow(path) as doc:
+        assert doc.page_count == 2
+        assert doc[1].get_pixmap().width > 0
+    cache.close_all()
+    assert doc.is_closed
@@ -0,0 +1,108 @@
+"""ExcelSessionPool behaviour against a fake backend, so it runs without Excel."""
+import os
+import threading
+import pytest
+from excel_session import ExcelSessionPool
+
+class FakeApp:
+    def __init__(self, number):
+        self.number = number
+        self.thread = threading.get_ident()
+        self.alive = True
+
+class FakeBackend:
+    def __init__(self):
+        self.started = []
+        self.quit = []
+        self.opened = []
+        self.closed = []
+
+    def start_app(self):
+        app = FakeApp(len(self.started))
+        self.started.append(app)
+        return app
+
+    def quit_app(self, app):
+        app.alive = False
+        self.quit.append((app, threading.get_ident()))
+
+    def is_alive(self, app):
+        return app.alive
+
+    def open_book(self, app, path):
+        book = (app.number, path)
+        self.opened.append(book)
+        return book
+
+    def add_book(self, app):
+        return (app.number, None)
+
+    def close_book(self, book):
+        self.closed.append(book)
+
+def run_in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def lease(pool):
+    with pool.app() as app:
+        return app
+
+def test_instance_is_reused_then_recycled_after_max_uses():
+    backend = FakeBackend()
+    pool = ExcelSessionPool(backend, max_uses=3)
+    apps = [lease(pool) for _ in range(4)]
+    assert apps[0] is apps[1] is apps[2]
+    assert apps[3] is not apps[0]
+    assert [app for app, _ in backend.quit] == [apps[0]]
+
+def test_instance_is_recycled_when_an_operation_fails():
+    backend = FakeBackend()
+    pool = ExcelSessionPool(backend)
+    with pytest.raises(RuntimeError):
+        with pool.app():
+            raise RuntimeError("COM error")
+    assert len(backend.quit) == 1
+    assert lease(pool) is not backend.quit[0][0]
+
+def test_dead_instance_is_replaced():
+    backend = FakeBackend()
+    pool = ExcelSessionPool(backend)
+    first = lease(pool)
+    first.alive = False
+    assert lease(pool) is not first
+
+def test_workbook_handles_are_reused_until_the_file_changes(tmp_path):
+    path = tmp_path / "book.xlsx"
+    path.write_bytes(b"v1")
+    backend = FakeBackend()
+    pool = ExcelSessionPool(backend)
+    for _ in range(2):
+        with pool.book(str(path)):
+            pass
+    assert len(backend.opened) == 1
+    os.utime(path, (1, 1))
+    with pool.book(str(path)):
+        pass
+    assert len(backend.opened) == 2
+    assert backend.closed == [backend.opened[0]]
+
+def test_idle_instance_is_only_reused_by_the_thread_that_started_it():
+    backend = FakeBackend()
+    pool = ExcelSessionPool(backend, max_apps=2)
+    main_app = lease(pool)
+    other_app = run_in_thread(lambda: lease(pool))
+    assert other_app is not main_app
+    assert other_app.thread != main_app.thread
+    assert lease(pool) is main_app
+
+def test_close_thread_quits_only_the_calling_threads_instances():
+    backend = FakeBackend()
+    pool = ExcelSessionPool(backend, max_apps=2)
+    main_app = lease(pool)
+    other_app = run_in_thread(lambda: (lease(pool), pool.close_thread())[0])
+    assert backend.quit == [(other_app, other_app.thread)]
+    assert lease(pool) is main_app
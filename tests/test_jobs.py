@@ -0,0 +1,35 @@
+"""Job results reach their callbacks through the polling loop, even after a callback fails."""
+import pytest
+from jobs import JobExecutor
+
+class FakeRoot:
+    """Stands in for a Tk root: after() callbacks are run by tick()."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+
+    def tick(self):
+        callback = self.scheduled.pop(0)
+        callback()
+
+def test_failing_callback_does_not_stop_polling():
+    executor = JobExecutor()
+    root = FakeRoot()
+    executor.attach(root)
+    results = []
+
+    def fail(job, result):
+        raise RuntimeError("window closed")
+
+    executor.submit(lambda: 1, on_done=fail)
+    executor.submit(lambda: 2, on_done=lambda job, result: results.append(result))
+    executor.shutdown()  # Both results are queued once the worker stops
+    with pytest.raises(RuntimeError):
+        root.tick()
+    assert len(root.scheduled) == 1
+    root.tick()
+    assert results == [2]
+    assert len(root.scheduled) == 1
@@ -0,0 +1,35 @@
+"""Page splits of the bundled workbook, read without Excel."""
+import os
+import pytest
+from excel_layout import split_range_into_pages
+from pagination import PaginationIndex, page_dimensions
+from sheet_geometry import read_geometry
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "Itut 7A Well Completions Schematic.xls")
+
+def test_geometry_is_read_from_the_file():
+    col_widths, row_heights = read_geometry(WORKBOOK, "Completion String").range_geometry("B2:AD88")
+    assert len(col_widths) == 29
+    assert len(row_heights) == 87
+
+def test_completion_string_landscape_a4():
+    pages = split_range_into_pages(WORKBOOK, "Completion String", "B2:AD88", "landscape", "A4")
+    assert pages == ["$B$2:$AD$30", "$B$31:$AD$53", "$B$54:$AD$84", "$B$85:$AD$88"]
+
+def test_more_pages_wide_than_columns_keeps_columns_on_the_page():
+    index = PaginationIndex([5, 5], [1] * 10)
+    scale, pages = index.paginate("A4", "portrait", pages_wide=3)
+    assert scale == pytest.approx(21.0 / 5)
+    assert sorted({(c0, c1) for _, _, c0, c1 in pages}) == [(0, 0), (1, 1)]
+
+@pytest.mark.parametrize("pages_wide", [2, 5, 20, 29, 40])
+def test_strips_fit_the_page_for_any_pages_wide(pages_wide):
+    col_widths, row_heights = read_geometry(WORKBOOK, "Completion String").range_geometry("B2:AD88")
+    index = PaginationIndex(col_widths, row_heights)
+    page_w, _ = page_dimensions("A4", "landscape")
+    scale, pages = index.paginate("A4", "landscape", pages_wide=pages_wide)
+    col_parts = sorted({(c0, c1) for _, _, c0, c1 in pages})
+    assert len(col_parts) <= pages_wide
+    for c0, c1 in col_parts:
+        assert sum(col_widths[c0:c1 + 1]) * scale <= page_w + 1e-6
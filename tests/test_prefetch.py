@@ -0,0 +1,95 @@
+"""Prefetched neighbour pages: buffered for the capture that asks for them, dropped when the context changes."""
+import threading
+import time
+import pytest
+from jobs import JobExecutor
+from prefetch import Prefetcher, neighbours
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(workers=2)
+    yield executor
+    executor.cancel_all()
+    executor.shutdown()
+
+def wait_idle(executor, timeout=5):
+    """Wait until no job, prefetch or otherwise, is queued or running."""
+    deadline = time.monotonic() + timeout
+    while executor.pending(background=True):
+        assert time.monotonic() < deadline, "jobs did not finish"
+        time.sleep(0.01)
+
+def test_neighbours_next_page_first_within_the_document():
+    assert neighbours(5, 10) == [6, 4]
+    assert neighbours(5, 10, radius=2) == [6, 4, 7, 3]
+    assert neighbours(1, 10, radius=2) == [2, 3]
+    assert neighbours(10, 10) == [9]
+    assert neighbours(1, 1) == []
+
+def test_prefetched_payload_is_taken_once(executor):
+    prefetcher = Prefetcher(executor)
+    prefetcher.schedule("doc", [("Page 2", "p2", lambda: b"page two"), ("Page 3", "p3", lambda: b"page three")])
+    wait_idle(executor)
+    assert prefetcher.take("p2") == b"page two"
+    assert prefetcher.take("p2") is None
+    assert prefetcher.take("p4") is None
+    assert prefetcher.hits == 1
+
+def test_buffered_pages_are_not_rendered_again(executor):
+    prefetcher = Prefetcher(executor)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b"page two"
+
+    prefetcher.schedule("doc", [("Page 2", "p2", render)])
+    wait_idle(executor)
+    prefetcher.schedule("doc", [("Page 2", "p2", render)])
+    wait_idle(executor)
+    assert calls == [1]
+
+def test_render_finishing_after_a_context_change_is_discarded(executor):
+    prefetcher = Prefetcher(executor)
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_render():
+        started.set()
+        finish.wait(5)
+        return b"old page"
+
+    prefetcher.schedule("old.pdf", [("Page 2", "p2", slow_render)])
+    assert started.wait(5)
+    prefetcher.schedule("new.pdf", [("Page 3", "p3", lambda: b"new page")])
+    finish.set()
+    wait_idle(executor)
+    assert prefetcher.take("p2") is None
+    assert prefetcher.take("p3") == b"new page"
+
+def test_context_change_drops_the_buffer(executor):
+    prefetcher = Prefetcher(executor)
+    prefetcher.schedule("old.pdf", [("Page 2", "p2", lambda: b"old page")])
+    wait_idle(executor)
+    prefetcher.schedule("new.pdf", [])
+    assert len(prefetcher.buffer) == 0
+
+def test_renders_are_listed_on_a_worker_thread(executor):
+    prefetcher = Prefetcher(executor)
+    threads = []
+
+    def list_renders():
+        threads.append(threading.current_thread())
+        return [("Page 2", "p2", lambda: b"page two")]
+
+    prefetcher.schedule_later("doc", list_renders)
+    wait_idle(executor)
+    assert threads and threads[0] is not threading.current_thread()
+    assert prefetcher.take("p2") == b"page two"
+
+def test_disabled_prefetcher_schedules_nothing(executor):
+    prefetcher = Prefetcher(executor)
+    prefetcher.enabled = False
+    prefetcher.schedule("doc", [("Page 2", "p2", lambda: b"page two")])
+    prefetcher.schedule_later("doc", lambda: [("Page 3", "p3", lambda: b"page three")])
+    wait_idle(executor)
+    assert len(prefetcher.buffer) == 0
@@ -0,0 +1,28 @@
+"""The render cache keeps the renderer's buffer and writes the disk tier after use."""
+from render_cache import RenderCache
+
+def test_new_render_is_cached_without_copying_and_written_to_disk_after_the_block(tmp_path):
+    cache = RenderCache(disk_dir=str(tmp_path))
+    payload = bytearray(b"\x28\x00\x00\x00" * 1024)
+    with cache.rendered("key", lambda: payload) as data:
+        assert data is payload
+        assert cache.memory.get("key") is payload
+        assert "key" not in cache.disk
+    assert cache.disk.get("key") == payload
+
+def test_hit_does_not_render_or_rewrite(tmp_path):
+    cache = RenderCache(disk_dir=str(tmp_path))
+    cache.put("key", bytearray(b"payload"))
+    with cache.rendered("key", lambda: 1 / 0) as data:
+        assert data == b"payload"
+    assert cache.stats()["memory_hits"] == 1
+
+def test_failed_block_skips_the_disk_write(tmp_path):
+    cache = RenderCache(disk_dir=str(tmp_path))
+    try:
+        with cache.rendered("key", lambda: bytearray(b"payload")):
+            raise RuntimeError("clipboard busy")
+    except RuntimeError:
+        pass
+    assert "key" in cache.memory
+    assert "key" not in cache.disk
@@ -0,0 +1,49 @@
+"""Resolutions from the command line and the quality menus: plain DPIs and per-page output targets."""
+import pytest
+from render_engine import TARGET_DPI_RANGE, _output_size, dib_bytes, parse_dpi, target_dpi
+
+fitz = pytest.importorskip("fitz")
+
+A4 = (0, 0, 595, 842)
+
+@pytest.mark.parametrize("text, expected", [
+    ("300", 300), (" 72 ", 72), (150, 150),
+    ("8mp", ("mp", 8.0)), ("4000PX", ("px", 4000.0)), ("10mb", ("mb", 10.0)), ("0.5mp", ("mp", 0.5)),
+])
+def test_parse_dpi(text, expected):
+    assert parse_dpi(text) == expected
+
+@pytest.mark.parametrize("text", ["0", "000", "-300", "", "high", "300dpi", "0mp", "-4mp", "mp", "infmb", "nanpx"])
+def test_parse_dpi_rejects(text):
+    with pytest.raises(ValueError):
+        parse_dpi(text)
+
+def test_plain_dpi_is_unchanged():
+    assert target_dpi(fitz.Rect(A4), 300) == 300
+
+@pytest.mark.parametrize("target", [("mp", 8), ("px", 4000), ("mb", 8), ("mp", 0.5), ("mb", 2)])
+@pytest.mark.parametrize("bits", [24, 8, 1])
+def test_target_dpi_is_highest_within_target(target, bits):
+    rect = fitz.Rect(A4)
+    dpi = target_dpi(rect, target, bits)
+    kind, value = target
+
+    def within(dpi):
+        width, height = _output_size(rect, dpi)
+        if kind == "mp":
+            return width * height <= value * 1e6
+        if kind == "px":
+            return max(width, height) <= value
+        return dib_bytes(width, height, bits) <= value * 1024 * 1024
+
+    assert TARGET_DPI_RANGE[0] < dpi < TARGET_DPI_RANGE[1]
+    assert within(dpi) and not within(dpi + 1)
+
+def test_target_dpi_is_clamped():
+    low, high = TARGET_DPI_RANGE
+    assert target_dpi(fitz.Rect(0, 0, 10, 10), ("mp", 8)) == high
+    assert target_dpi(fitz.Rect(A4), ("px", 10)) == low
+
+def test_target_dpi_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        target_dpi(fitz.Rect(A4), ("gb", 1))
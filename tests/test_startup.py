@@ -0,0 +1,16 @@
+"""The GUIs must paint their window before loading PyMuPDF, NumPy or Excel automation."""
+import os
+import pytest
+from benchmark import DEFAULT_IMPORT_BUDGET_MS, GUI_SCRIPTS, HEAVY_IMPORTS, gui_imports, measure_imports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("script", GUI_SCRIPTS)
+def test_gui_imports_within_budget(script):
+    modules = gui_imports(os.path.join(ROOT, script))
+    # Best of three, as the first run also pays for a cold disk cache
+    runs = [measure_imports(modules, ROOT) for _ in range(3)]
+    best_ms = min(total for total, _ in runs)
+    heavy = sorted({name for name in runs[0][1] if name.split(".")[0] in HEAVY_IMPORTS})
+    assert not heavy, f"{script} imports {', '.join(heavy)} before its window is shown"
+    assert best_ms <= DEFAULT_IMPORT_BUDGET_MS, f"{script} start-up imports took {best_ms:.0f} ms"
@@ -0,0 +1,42 @@
+"""Strip rendering: common pages must come out as the one-shot render, large ones at its exact size."""
+import pytest
+import benchmark
+import tiled
+from clipboard import pixmap_to_dib
+from render_engine import RENDER_MODES, page_dib
+
+fitz = pytest.importorskip("fitz")
+
+@pytest.fixture(scope="module")
+def vector_doc(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tiled") / "vector.pdf")
+    benchmark.make_pdf(path, "vector", "A4", pages=1)
+    doc = fitz.open(path)
+    yield doc
+    doc.close()
+
+@pytest.mark.parametrize("paper, dpi", [("A4", 600), ("A3", 600)])
+def test_default_strip_holds_common_pages(paper, dpi):
+    doc = fitz.open()
+    width, height = benchmark.PAPER_POINTS[paper]
+    assert tiled.fits_in_strip(doc.new_page(width=width, height=height), dpi)
+
+@pytest.mark.parametrize("mode", ["color", "gray", "bw"])
+def test_vector_dib_matches_one_shot_render(vector_doc, mode):
+    page = vector_doc[0]
+    gray = mode != "color"
+    pix = page.get_pixmap(matrix=fitz.Matrix(600 / 72, 600 / 72), alpha=False,
+                          colorspace=fitz.csGRAY if gray else fitz.csRGB)
+    assert page_dib(page, 600, mode=mode) == pixmap_to_dib(pix, RENDER_MODES[mode])
+
+@pytest.mark.parametrize("paper, dpi", [("A1", 1200), ("A0", 1200), ("A4", 5000)])
+def test_strips_of_large_pages_tile_the_render_exactly(paper, dpi):
+    doc = fitz.open()
+    width, height = benchmark.PAPER_POINTS[paper]
+    page = doc.new_page(width=width, height=height)
+    irect = tiled.device_rect(page, dpi).round()
+    y = irect.y0
+    for strip in tiled.iter_strips(page, dpi, strip_bytes=8 * 1024 * 1024, gray=True):
+        assert strip.width == irect.width
+        y += strip.height
+    assert y == irect.y1
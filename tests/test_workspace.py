@@ -0,0 +1,64 @@
+"""Per-job scratch directories: unique, removed when the job ends, and swept when abandoned."""
+import os
+import tempfile
+import time
+import pytest
+import workspace
+from workspace import ROOT_PREFIX, STALE_AFTER_SECONDS, Workspace, sweep_stale, workspace_root
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    """A fresh per-process root inside tmp_path, which also stands in for the system temp dir."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(workspace, "_root", None)
+    monkeypatch.setattr(workspace.atexit, "register", lambda *args: None)
+    return workspace_root()
+
+def make_root(base, name, age):
+    path = os.path.join(base, name)
+    os.makedirs(path)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+def test_one_root_per_process(root, tmp_path):
+    assert workspace_root() == root
+    assert os.path.dirname(root) == str(tmp_path)
+    assert os.path.basename(root).startswith(ROOT_PREFIX)
+
+def test_workspace_is_private_and_removed(root):
+    with Workspace("export") as first, Workspace("export") as second:
+        assert first.dir != second.dir
+        assert os.path.dirname(first.dir) == root
+        with open(first.path("sheet.xlsx"), "w") as f:
+            f.write("data")
+    assert not os.path.exists(first.dir)
+    assert not os.path.exists(second.dir)
+
+def test_workspace_is_removed_when_the_job_fails(root):
+    with pytest.raises(RuntimeError):
+        with Workspace("export") as work:
+            open(work.path("part.pdf"), "w").close()
+            raise RuntimeError("export failed")
+    assert not os.path.exists(work.dir)
+
+def test_file_names_are_unique_across_workspaces(root):
+    with Workspace("export") as first, Workspace("export") as second:
+        # Excel cannot open two workbooks of the same name, even from different directories
+        assert os.path.basename(first.path("sheet.xlsx")) != os.path.basename(second.path("sheet.xlsx"))
+        assert first.path("sheet.xlsx").endswith(".xlsx")
+
+def test_swept_root_is_recreated(root):
+    os.rmdir(root)
+    with Workspace("export") as work:
+        assert os.path.isdir(work.dir)
+
+def test_sweep_removes_only_abandoned_roots(root, tmp_path):
+    stale = make_root(tmp_path, ROOT_PREFIX + "crashed", STALE_AFTER_SECONDS + 60)
+    fresh = make_root(tmp_path, ROOT_PREFIX + "running", 60)
+    other = make_root(tmp_path, "someone_else", STALE_AFTER_SECONDS + 60)
+    stamp = time.time() - STALE_AFTER_SECONDS - 60
+    os.utime(root, (stamp, stamp))
+    sweep_stale(str(tmp_path))
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh) and os.path.exists(other) and os.path.exists(root)
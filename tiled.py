@@ -0,0 +1,161 @@
+"""
+Strip-by-strip rendering for pages too large to rasterize in one piece.
+
+A page is recorded into a display list once and then rasterized in horizontal
+strips through clip rectangles aligned to whole device pixels, so each strip
+holds the rows a one-shot render would produce for that band. Strips are
+streamed into a writer (CF_DIB, PNG or PNM), so peak raster memory is one
+strip regardless of page size or DPI. Grayscale renders (for 8- and 1-bit
+DIBs) take a third of the memory per strip row.
+
+Pages that fit in one strip are rendered in one piece, byte for byte the same
+as a one-shot render. A split page is not: MuPDF clips every edge to the strip
+it is drawn into, which shifts the anti-aliasing of vector paths and scaled
+images crossing a strip boundary along their whole length, by up to a few
+dozen levels. The default strip is therefore large enough for A3 at 600 DPI,
+so only pages that could not be rendered in one piece within the memory
+budget are split.
+"""
+import struct
+import zlib
+from clipboard import DibWriter
+from instrumentation import span
+
+DEFAULT_STRIP_BYTES = 256 * 1024 * 1024
+
+def device_rect(page, dpi, clip=None):
+    """Device-pixel rectangle a one-shot render of the page (or clip) would cover."""
+    import fitz  # PyMuPDF
+    zoom = dpi / 72
+    return (fitz.Rect(clip or page.rect) & page.rect) * fitz.Matrix(zoom, zoom)
+
+def iter_strips(page, dpi, clip=None, strip_bytes=DEFAULT_STRIP_BYTES, gray=False):
+    """
+    Yield RGB (or grayscale) pixmaps covering the rendered page (or clip, in
+    page points) from top to bottom, each at most strip_bytes of samples but
+    at least one row.
+    """
+    import fitz  # PyMuPDF
+    zoom = dpi / 72
+    mat = fitz.Matrix(zoom, zoom)
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+    clip = fitz.Rect(clip or page.rect) & page.rect
+    irect = device_rect(page, dpi, clip).round()
+    rows = max(1, strip_bytes // max(1, irect.width * (1 if gray else 3)))
+    if rows >= irect.height:
+        # Small enough for one piece: exactly the one-shot render
+        yield page.get_pixmap(matrix=mat, clip=clip, colorspace=colorspace, alpha=False)
+        return
+
+    dl = page.get_displaylist()
+    for y0 in range(irect.y0, irect.y1, rows):
+        y1 = min(y0 + rows, irect.y1)
+        # Outer edges keep the exact clip; inner edges sit on pixel boundaries
+        top = clip.y0 if y0 == irect.y0 else y0 / zoom
+        bottom = clip.y1 if y1 == irect.y1 else y1 / zoom
+        with span("render.strip"):
+            strip = dl.get_pixmap(matrix=mat, clip=fitz.Rect(clip.x0, top, clip.x1, bottom),
+                                  colorspace=colorspace, alpha=False)
+        if strip.y <= y0 and strip.y + strip.height >= y1 and strip.height != y1 - y0:
+            strip = trim_rows(strip, y0, y1)
+        if strip.height != y1 - y0 or strip.width != irect.width:
+            raise RuntimeError(f"Strip {y0}-{y1} rendered as {strip.width}x{strip.height}.")
+        yield strip
+        del strip
+
+def trim_rows(pix, y0, y1):
+    """
+    Copy of device rows y0..y1 of a strip. At high zoom, clip edges divided
+    back into page points can round out to one more row above or below.
+    """
+    import fitz  # PyMuPDF
+    start = (y0 - pix.y) * pix.stride
+    trimmed = fitz.Pixmap(pix.colorspace, pix.width, y1 - y0,
+                          bytes(pix.samples_mv[start:start + (y1 - y0) * pix.stride]), False)
+    trimmed.set_dpi(pix.xres, pix.yres)
+    return trimmed
+
+class PngWriter:
+    """Streams 8-bit RGB rows into a PNG file, one IDAT chunk per written block."""
+
+    def __init__(self, f, width, height, dpi=96):
+        self.f = f
+        self.width = width
+        self.compressor = zlib.compressobj(6)
+        f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        pixels_per_metre = int(dpi / 0.0254 + 0.5)
+        self._chunk(b"pHYs", struct.pack(">IIB", pixels_per_metre, pixels_per_metre, 1))
+
+    def _chunk(self, kind, data):
+        self.f.write(struct.pack(">I", len(data)))
+        self.f.write(kind)
+        self.f.write(data)
+        self.f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, pix):
+        row_bytes = self.width * 3
+        samples = pix.samples_mv
+        data = bytearray()
+        for y in range(pix.height):
+            data += self.compressor.compress(b"\x00")  # Filter type None
+            data += self.compressor.compress(samples[y * pix.stride:y * pix.stride + row_bytes])
+        if data:
+            self._chunk(b"IDAT", bytes(data))
+
+    def close(self):
+        self._chunk(b"IDAT", self.compressor.flush())
+        self._chunk(b"IEND", b"")
+
+class PnmWriter:
+    """Streams 8-bit RGB rows into a binary PPM (P6) file."""
+
+    def __init__(self, f, width, height, dpi=96):
+        self.f = f
+        self.width = width
+        f.write(b"P6\n%d %d\n255\n" % (width, height))
+
+    def write(self, pix):
+        row_bytes = self.width * 3
+        samples = pix.samples_mv
+        if pix.stride == row_bytes:
+            self.f.write(samples)
+            return
+        for y in range(pix.height):
+            self.f.write(samples[y * pix.stride:y * pix.stride + row_bytes])
+
+    def close(self):
+        pass
+
+FILE_WRITERS = {"png": PngWriter, "pnm": PnmWriter}
+
+def fits_in_strip(page, dpi, clip=None, strip_bytes=DEFAULT_STRIP_BYTES):
+    """True when the rendered page (or clip) is small enough to rasterize in one piece."""
+    irect = device_rect(page, dpi, clip).round()
+    return irect.width * irect.height * 3 <= strip_bytes
+
+def render_dib(page, dpi, clip=None, strip_bytes=DEFAULT_STRIP_BYTES, bits_per_pixel=24):
+    """
+    Render a page (or clip, in page points) straight into a CF_DIB payload,
+    one strip at a time: 24-bit color, 8-bit gray or 1-bit black and white.
+    """
+    irect = device_rect(page, dpi, clip).round()
+    writer = None
+    for strip in iter_strips(page, dpi, clip, strip_bytes, gray=bits_per_pixel < 24):
+        if writer is None:
+            # Same resolution fields as pixmap_to_dib() writes for a one-shot render
+            writer = DibWriter(irect.width, irect.height, strip.xres, bits_per_pixel)
+        with span("encode.dib"):
+            writer.write(strip)
+    return writer.result()
+
+def render_to_file(page, dpi, path, fmt="png", clip=None, strip_bytes=DEFAULT_STRIP_BYTES):
+    """Render a page (or clip, in page points) to a PNG or PNM file, one strip at a time."""
+    irect = device_rect(page, dpi, clip).round()
+    with open(path, "wb") as f:
+        writer = FILE_WRITERS[fmt](f, irect.width, irect.height, dpi)
+        for strip in iter_strips(page, dpi, clip, strip_bytes):
+            with span("encode." + fmt):
+                writer.write(strip)
+        writer.close()
+    return path
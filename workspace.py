@@ -0,0 +1,90 @@
+"""
+Private scratch directories for capture jobs.
+
+Every job that writes intermediate files (sheet copies, partial PDF exports)
+gets its own directory under a per-process root, so concurrent jobs and other
+instances of the tools, e.g. several users on one terminal server, never
+share a file name. The directory is removed when the job ends, whether it
+succeeded or not; roots left behind by crashed processes are swept on start.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+ROOT_PREFIX = "pdf_to_clipboard_work_"
+# Roots untouched for this long are considered abandoned by a crashed process
+STALE_AFTER_SECONDS = 24 * 60 * 60
+
+_root = None
+_root_lock = threading.Lock()
+
+def _remove_tree(path, attempts=5, delay=0.2):
+    """rmtree that retries while another process (e.g. Excel on Windows) still holds a file open."""
+    for attempt in range(attempts):
+        shutil.rmtree(path, ignore_errors=True)
+        if not os.path.exists(path):
+            return True
+        time.sleep(delay * (attempt + 1))
+    return False
+
+def sweep_stale(base=None, max_age=STALE_AFTER_SECONDS):
+    """Remove work roots of other processes that have not been touched for max_age seconds."""
+    base = base or tempfile.gettempdir()
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(base))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.name.startswith(ROOT_PREFIX) or entry.path == _root:
+            continue
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                _remove_tree(entry.path, attempts=1)
+        except OSError:
+            pass
+
+def workspace_root():
+    """Per-process directory holding every job's workspace; removed at exit."""
+    global _root
+    with _root_lock:
+        if _root is None:
+            _root = tempfile.mkdtemp(prefix=ROOT_PREFIX)
+            atexit.register(_remove_tree, _root)
+            sweep_stale()
+        return _root
+
+class Workspace:
+    """
+    A unique scratch directory for one job, removed when the with block exits:
+
+        with Workspace("export") as work:
+            sheet_copy = work.path("sheet.xlsx")
+    """
+
+    def __init__(self, name="job"):
+        self.name = name
+        self.dir = None
+
+    def __enter__(self):
+        root = workspace_root()
+        os.makedirs(root, exist_ok=True)  # In case another instance swept it during a long idle spell
+        self.dir = tempfile.mkdtemp(prefix=f"{self.name}_", dir=root)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _remove_tree(self.dir)
+        return False
+
+    def path(self, filename):
+        """
+        Path for filename inside the workspace. The workspace's unique suffix
+        is added to the file name as well, because Excel cannot open two
+        workbooks with the same name at once, even from different directories.
+        """
+        stem, ext = os.path.splitext(filename)
+        suffix = os.path.basename(self.dir)[len(self.name) + 1:]
+        return os.path.join(self.dir, f"{stem}_{suffix}{ext}")